@@ -0,0 +1,215 @@
+import codecs
+import csv
+import io
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from models import Product, ProductCreate, Testimonial, TestimonialCreate
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Per-row errors kept in the response; the total is always reported
+MAX_REPORTED_ERRORS = 1000
+
+# Collection -> (input model, stored model, exported fields)
+BULK_KINDS: Dict[str, Tuple[Type[BaseModel], Type[BaseModel], Tuple[str, ...]]] = {
+    'products': (
+        ProductCreate, Product,
+        ("id", "name", "category", "image", "price", "featured")
+    ),
+    'testimonials': (
+        TestimonialCreate, Testimonial,
+        ("id", "name", "rating", "review", "initials", "review_image", "approved")
+    ),
+}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """(row number, dict or error message) for each non-blank NDJSON line"""
+    row = 0
+    async for line in lines:
+        row += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, f"Invalid JSON: {e}"
+            continue
+        yield row, record if isinstance(record, dict) else "Expected a JSON object"
+
+
+async def iter_csv(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """(row number, dict or error message) for each CSV record after the header"""
+    header: Optional[List[str]] = None
+    row = 0
+    record = ""
+    async for line in lines:
+        record += line
+        # A quoted field may span lines; the record is complete once quotes balance
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        row += 1
+        if not text.strip():
+            continue
+        values = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield row, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty cells fall back to the model defaults
+        yield row, {name: value for name, value in zip(header, values) if value != ""}
+    if record.strip():
+        yield row + 1, "Unterminated quoted field"
+
+
+def _format_errors(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+
+class BulkImportResult:
+    """Counters and per-row errors for one import"""
+
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.upserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "upserted": self.upserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+
+async def import_records(name: str, records: AsyncIterator[Tuple[int, Any]]) -> Dict[str, Any]:
+    """Validate records in batches and write each batch with one unordered bulk_write
+
+    Rows without an id get one from a single sequence allocation per batch,
+    made after the sequence is raised past the batch's own ids; rows with an
+    id are upserted on it, so re-importing an export is idempotent.
+    """
+    create_model, stored_model, _ = BULK_KINDS[name]
+    result = BulkImportResult()
+    batch: List[Tuple[int, Optional[int], BaseModel]] = []
+
+    async def flush():
+        nonlocal batch
+        rows, batch = batch, []
+        explicit = [id_ for _, id_, _ in rows if id_ is not None]
+        if explicit:
+            # Otherwise an id-less row could be given an id this batch also carries
+            await Database.raise_sequence(name, max(explicit))
+        new_ids = iter(await Database.allocate_ids(name, sum(1 for _, id_, _ in rows if id_ is None)))
+        operations = []
+        for _, id_, data in rows:
+            if id_ is None:
+                operations.append(InsertOne(stored_model(id=next(new_ids), **data.dict()).dict()))
+            else:
+                document = stored_model(id=id_, **data.dict()).dict()
+                created_at = document.pop("created_at")
+                operations.append(UpdateOne(
+                    {"id": id_},
+                    {"$set": document, "$setOnInsert": {"created_at": created_at}},
+                    upsert=True
+                ))
+        collections = Database.get_collections()
+        try:
+            outcome = await collections[name].bulk_write(operations, ordered=False)
+            details = outcome.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for err in details.get('writeErrors', []):
+                result.error(rows[err['index']][0], err.get('errmsg', 'Write failed'))
+        result.inserted += details.get('nInserted', 0)
+        result.upserted += details.get('nUpserted', 0)
+        result.updated += details.get('nModified', 0)
+
+    async for row, record in records:
+        result.received += 1
+        if isinstance(record, str):
+            result.error(row, record)
+            continue
+        id_ = record.pop("id", None)
+        try:
+            id_ = int(id_) if id_ is not None else None
+            data = create_model(**record)
+        except ValidationError as e:
+            result.error(row, _format_errors(e))
+            continue
+        except (TypeError, ValueError):
+            result.error(row, "id: must be an integer")
+            continue
+        batch.append((row, id_, data))
+        if len(batch) >= BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    logger.info(
+        f"Bulk import into {name}: {result.received} rows, {result.inserted} inserted, "
+        f"{result.upserted} upserted, {result.updated} updated, {result.failed} failed"
+    )
+    return result.dict()
+
+
+async def export_records(name: str, fmt: str) -> AsyncIterator[bytes]:
+    """Stream a collection as NDJSON or CSV, in import-compatible form"""
+    _, _, fields = BULK_KINDS[name]
+    collections = Database.get_collections()
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    cursor = collections[name].find({}, projection).sort("id", 1).batch_size(500)
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        async for doc in cursor:
+            writer.writerow(["" if doc.get(field) is None else doc.get(field) for field in fields])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+    else:
+        async for doc in cursor:
+            line = {field: doc.get(field) for field in fields}
+            yield json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n"
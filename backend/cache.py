@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from models import Product, ProductResponse, Testimonial, TestimonialResponse
+from database import Database
+from images import ImagePipeline
+from compression import coded_etag, compress
+from serialization import DocumentShape, dumps
+from landing import render_landing, template_stamp
+
+PRODUCT_SHAPE = DocumentShape(ProductResponse, Product)
+TESTIMONIAL_SHAPE = DocumentShape(TestimonialResponse, Testimonial)
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogPayload:
+    """Response data plus its rendered body (JSON unless given), once per cache version"""
+    __slots__ = ('items', 'body', 'etag', '_encoded')
+
+    def __init__(self, items: Any, body: Optional[bytes] = None):
+        self.items = items
+        self.body = dumps(items) if body is None else body
+        # Strong validator derived from the bytes, so it is identical across workers
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self._encoded: Dict[str, asyncio.Future] = {}
+
+    async def encoded(self, encoding: str) -> bytes:
+        """Body compressed with encoding ("br" or "gzip"), computed once per version
+
+        Compression runs in a thread so a large body never stalls the event
+        loop; concurrent requests share the one in-flight compression.
+        """
+        task = self._encoded.get(encoding)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(compress, self.body, encoding))
+            self._encoded[encoding] = task
+        if task.done():
+            return task.result()
+        # Shielded: a client disconnecting must not cancel it for the others
+        return await asyncio.shield(task)
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """Strong ETag of the body as sent: identity, or with the coding's suffix"""
+        return coded_etag(self.etag, encoding)
+
+
+class CatalogCache:
+    """Versioned in-process cache for catalog reads (products, testimonials)
+
+    Versions are shared version stamps in Mongo: invalidate() bumps them, and
+    every worker polls them every CACHE_SYNC_INTERVAL_S seconds, dropping
+    entries whose stamp moved. Stale reads in other workers last at most one
+    interval.
+    """
+    _entries: Dict[str, Tuple[int, Any]] = {}
+    _versions: Dict[str, int] = {}
+    _locks: Dict[str, asyncio.Lock] = {}
+    _hits = 0
+    _misses = 0
+    _invalidations = 0
+    # Last shared stamp seen per key
+    _stamps: Dict[str, int] = {}
+    _sync_task: Optional[asyncio.Task] = None
+    # Landing template file the cached landing page was rendered from
+    _template_stamp: Optional[Tuple[str, int, int]] = None
+
+    KEYS = ('products', 'testimonials')
+    # Entries rendered from other entries, dropped along with them
+    DEPENDENTS = {'products': ('landing',), 'testimonials': ('landing',)}
+
+    @classmethod
+    def version(cls, key: str) -> int:
+        """Current version of a cached catalog entry"""
+        return cls._versions.get(key, 0)
+
+    @classmethod
+    async def _get(cls, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, loading it once per version"""
+        entry = cls._entries.get(key)
+        if entry is not None and entry[0] == cls.version(key):
+            cls._hits += 1
+            return entry[1]
+
+        # Single-flight: concurrent misses wait for the first loader
+        lock = cls._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = cls._entries.get(key)
+            if entry is not None and entry[0] == cls.version(key):
+                cls._hits += 1
+                return entry[1]
+
+            cls._misses += 1
+            version = cls.version(key)
+            value = await loader()
+            # Only store if nothing invalidated the key while we were loading
+            if version == cls.version(key):
+                cls._entries[key] = (version, value)
+            return value
+
+    @staticmethod
+    async def _load_products() -> CatalogPayload:
+        # Documents map straight to response dicts; the projection keeps _id/created_at in Mongo
+        products = await Database.find_products(fields=PRODUCT_SHAPE.fields).to_list(None)
+        manifests = await ImagePipeline.manifests(p.get("image") for p in products)
+        return CatalogPayload([
+            PRODUCT_SHAPE(p, image_info=ImagePipeline.image_info(manifests.get(p.get("image"))))
+            for p in products
+        ])
+
+    @staticmethod
+    async def _load_testimonials() -> CatalogPayload:
+        testimonials = await Database.find_testimonials(fields=TESTIMONIAL_SHAPE.fields).to_list(None)
+        manifests = await ImagePipeline.manifests(t.get("review_image") for t in testimonials)
+        return CatalogPayload([
+            TESTIMONIAL_SHAPE(t, review_image_info=ImagePipeline.image_info(manifests.get(t.get("review_image"))))
+            for t in testimonials
+        ])
+
+    @classmethod
+    async def _load_landing(cls) -> CatalogPayload:
+        products = await cls.get_products_payload()
+        testimonials = await cls.get_testimonials_payload()
+        # Byte-identical to the API responses, so the app can start from it as is
+        catalog_json = b'{"products":' + products.body + b',"testimonials":' + testimonials.body + b'}'
+        return CatalogPayload(
+            {"products": products.items, "testimonials": testimonials.items},
+            body=render_landing(products.items, testimonials.items, catalog_json)
+        )
+
+    @classmethod
+    async def get_products_payload(cls) -> CatalogPayload:
+        """Get the rendered product catalog, served from memory when fresh"""
+        return await cls._get('products', cls._load_products)
+
+    @classmethod
+    async def get_testimonials_payload(cls) -> CatalogPayload:
+        """Get the rendered testimonial list, served from memory when fresh"""
+        return await cls._get('testimonials', cls._load_testimonials)
+
+    @classmethod
+    async def get_landing_payload(cls) -> CatalogPayload:
+        """Get the prerendered landing page, re-rendered when the catalog or its template changes"""
+        # A frontend deploy rewrites index.html (new bundle hashes) without touching the catalog
+        stamp = template_stamp()
+        if stamp != cls._template_stamp:
+            cls._template_stamp = stamp
+            cls._drop('landing')
+        return await cls._get('landing', cls._load_landing)
+
+    @classmethod
+    def _drop(cls, key: str):
+        for dropped in (key, *cls.DEPENDENTS.get(key, ())):
+            cls._versions[dropped] = cls.version(dropped) + 1
+            cls._entries.pop(dropped, None)
+
+    @classmethod
+    async def invalidate(cls, *keys: str):
+        """Drop cached entries in every worker; the whole catalog when no key is given"""
+        cls._invalidations += 1
+        for key in keys or cls.KEYS:
+            # Locally first, so this worker never serves the old entry
+            cls._drop(key)
+            try:
+                cls._stamps[key] = await Database.bump_version(f"catalog:{key}")
+            except Exception as e:
+                logger.error(f"Error publishing {key} cache invalidation: {e}")
+
+    @classmethod
+    async def sync(cls):
+        """Drop entries whose shared stamp was bumped by another worker"""
+        stamps = await Database.get_versions(f"catalog:{key}" for key in cls.KEYS)
+        for key in cls.KEYS:
+            stamp = stamps[f"catalog:{key}"]
+            if cls._stamps.get(key) != stamp:
+                cls._stamps[key] = stamp
+                cls._drop(key)
+
+    @classmethod
+    async def _run_sync(cls, interval: float):
+        while True:
+            try:
+                await cls.sync()
+            except Exception as e:
+                logger.error(f"Error syncing catalog cache versions: {e}")
+            await asyncio.sleep(interval)
+
+    @classmethod
+    def start(cls):
+        """Poll shared version stamps every CACHE_SYNC_INTERVAL_S seconds (0 disables)"""
+        interval = float(os.environ.get('CACHE_SYNC_INTERVAL_S', 1))
+        if interval > 0 and (cls._sync_task is None or cls._sync_task.done()):
+            cls._sync_task = asyncio.get_running_loop().create_task(cls._run_sync(interval))
+
+    @classmethod
+    async def stop(cls):
+        if cls._sync_task is not None:
+            cls._sync_task.cancel()
+            try:
+                await cls._sync_task
+            except asyncio.CancelledError:
+                pass
+            cls._sync_task = None
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Hit/miss counters and current versions"""
+        lookups = cls._hits + cls._misses
+        return {
+            "hits": cls._hits,
+            "misses": cls._misses,
+            "hit_ratio": round(cls._hits / lookups, 4) if lookups else 0,
+            "invalidations": cls._invalidations,
+            "versions": {key: cls.version(key) for key in cls.KEYS},
+            "shared_versions": dict(cls._stamps),
+            "cached": sorted(cls._entries.keys())
+        }
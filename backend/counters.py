@@ -0,0 +1,201 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+from pymongo import ReplaceOne, UpdateOne
+
+from models import TelegramClick
+from database import Database
+from rollups import AnalyticsRollup
+from useragent import classify
+
+logger = logging.getLogger(__name__)
+
+
+class ClickCounters:
+    """Pre-aggregated telegram click counters kept in the click_counters collection
+
+    One document per bucket, keyed by _id:
+      total                  all clicks
+      hour:YYYY-MM-DDTHH     clicks in that UTC hour
+      day:YYYY-MM-DD         clicks on that UTC day
+      device:<class>         clicks per device class (see useragent.classify_device)
+      os:<family>            clicks per OS family (see useragent.classify_os)
+      filtered:<reason>:<event>  events dropped at ingestion (bot, duplicate), never stored raw
+    """
+
+    @staticmethod
+    def _keys(click: TelegramClick) -> List[Tuple[str, str, Any]]:
+        ts = click.timestamp
+        hour = ts.replace(minute=0, second=0, microsecond=0)
+        day = hour.replace(hour=0)
+        if click.device_class and click.os_family:
+            device, os_family = click.device_class, click.os_family
+        else:
+            device, os_family = classify(click.user_agent)
+        return [
+            ("total", "total", None),
+            (f"hour:{hour:%Y-%m-%dT%H}", "hour", hour),
+            (f"day:{day:%Y-%m-%d}", "day", day),
+            (f"device:{device}", "device", device),
+            (f"os:{os_family}", "os", os_family),
+        ]
+
+    @staticmethod
+    def _updates(counts: Dict[Tuple[str, str, Any], int]) -> List[UpdateOne]:
+        return [
+            UpdateOne(
+                {"_id": key},
+                {"$inc": {"count": n}, "$setOnInsert": {"kind": kind, "bucket": bucket}},
+                upsert=True,
+            )
+            for (key, kind, bucket), n in counts.items()
+        ]
+
+    @classmethod
+    async def record(cls, clicks: Iterable[TelegramClick]):
+        """Increment counters for clicks that were just written"""
+        counts = Counter()
+        for click in clicks:
+            counts.update(cls._keys(click))
+        if not counts:
+            return
+        collections = Database.get_collections()
+        await collections['click_counters'].bulk_write(cls._updates(counts), ordered=False)
+
+    @classmethod
+    async def record_filtered(cls, counts: Dict[Tuple[str, str], int]):
+        """Increment counters for events filtered at ingestion, keyed by (reason, event)"""
+        if not counts:
+            return
+        collections = Database.get_collections()
+        await collections['click_counters'].bulk_write(cls._updates({
+            (f"filtered:{reason}:{event}", "filtered", None): n for (reason, event), n in counts.items()
+        }), ordered=False)
+
+    @staticmethod
+    async def _get(key: str) -> int:
+        collections = Database.get_collections()
+        doc = await collections['click_counters'].find_one({"_id": key}, {"count": 1})
+        return doc["count"] if doc else 0
+
+    @classmethod
+    async def total(cls) -> int:
+        """Total telegram clicks"""
+        return await cls._get("total")
+
+    @staticmethod
+    async def by_kind(kind: str) -> Dict[str, int]:
+        """All buckets of one kind ("hour", "day", "device" or "os") as {key: count}"""
+        collections = Database.get_collections()
+        cursor = collections['click_counters'].find({"kind": kind}, {"count": 1}).sort("_id", 1)
+        return {doc["_id"].split(":", 1)[1]: doc["count"] async for doc in cursor}
+
+    @staticmethod
+    async def recent(hours: int = 24) -> int:
+        """Clicks in the last `hours` hourly buckets, the current (partial) hour included"""
+        since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+        collections = Database.get_collections()
+        # hour: keys sort chronologically, so the kind_id index bounds the scan
+        cursor = collections['click_counters'].find(
+            {"kind": "hour", "_id": {"$gte": f"hour:{since:%Y-%m-%dT%H}"}}, {"count": 1}
+        )
+        return sum([doc["count"] async for doc in cursor])
+
+    @classmethod
+    async def summary(cls) -> Dict[str, Any]:
+        """Total plus per-device and per-OS counters"""
+        return {
+            "total": await cls.total(),
+            "devices": await cls.by_kind("device"),
+            "os": await cls.by_kind("os"),
+            "filtered": await cls.by_kind("filtered")
+        }
+
+    @staticmethod
+    async def classify_missing() -> int:
+        """Store device_class/os_family on raw events ingested before classification existed"""
+        collections = Database.get_collections()
+        missing = {"event": "telegram_click", "device_class": None}
+        updated = 0
+        for user_agent in await collections['analytics'].distinct("user_agent", missing):
+            device, os_family = classify(user_agent)
+            result = await collections['analytics'].update_many(
+                {**missing, "user_agent": user_agent},
+                {"$set": {"device_class": device, "os_family": os_family}},
+            )
+            updated += result.modified_count
+        return updated
+
+    @classmethod
+    async def rebuild(cls) -> Dict[str, int]:
+        """Recompute every counter from the hourly rollups and the raw analytics events
+
+        Hours before the rollup watermark come from the rollups, since their raw
+        events may already have expired; later hours come from raw events.
+        Clicks ingested while the rebuild runs may be counted twice or not at
+        all, so run it when click traffic is quiet.
+        """
+        collections = Database.get_collections()
+        await cls.classify_missing()
+        counts = Counter()
+        match = {"event": "telegram_click"}
+        watermark = await AnalyticsRollup.watermark()
+        if watermark is not None:
+            match["timestamp"] = {"$gte": watermark}
+            rollups = collections['analytics_rollups'].find(
+                {"granularity": "hour", "bucket": {"$lt": watermark}}
+            )
+            async for doc in rollups:
+                click = TelegramClick(
+                    timestamp=doc["bucket"], device_class=doc["device_class"], os_family=doc["os_family"]
+                )
+                for key in cls._keys(click):
+                    counts[key] += doc["count"]
+        # Group by user agent and hour so only distinct pairs reach Python
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "ua": {"$ifNull": ["$user_agent", ""]},
+                    "hour": {"$dateToString": {"format": "%Y-%m-%dT%H", "date": "$timestamp"}},
+                },
+                "count": {"$sum": 1},
+            }},
+        ]
+        async for row in collections['analytics'].aggregate(pipeline, allowDiskUse=True):
+            hour = datetime.strptime(row["_id"]["hour"], "%Y-%m-%dT%H")
+            click = TelegramClick(user_agent=row["_id"]["ua"], timestamp=hour)
+            for key in cls._keys(click):
+                counts[key] += row["count"]
+
+        replacements = [
+            ReplaceOne(
+                {"_id": key},
+                {"_id": key, "kind": kind, "bucket": bucket, "count": n},
+                upsert=True,
+            )
+            for (key, kind, bucket), n in counts.items()
+        ]
+        if replacements:
+            await collections['click_counters'].bulk_write(replacements, ordered=False)
+        keep = [key for key, _, _ in counts]
+        # Filtered events have no raw documents to rebuild from, so their counters stay
+        removed = await collections['click_counters'].delete_many(
+            {"_id": {"$nin": keep}, "kind": {"$ne": "filtered"}}
+        )
+        logger.info(f"Rebuilt {len(counts)} click counters")
+        return {"counters": len(counts), "removed": removed.deleted_count}
+
+
+if __name__ == "__main__":
+    # Backfill counters from raw events: python counters.py (from backend/)
+    from pathlib import Path
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(ClickCounters.rebuild()))
+    Database.close_connection()
@@ -1,20 +1,169 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from pymongo.monitoring import ConnectionPoolListener
+from datetime import datetime
+import asyncio
+import logging
 import os
-from typing import List
-from models import Product, Testimonial, TelegramClick
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+from models import Product, Testimonial, TelegramClick, PageView
+from metrics import CommandMetrics, instrument
 
+logger = logging.getLogger(__name__)
+
+# Display order of the catalog: featured (watches) first, then by category and id
+PRODUCT_SORT = [("featured", DESCENDING), ("category", ASCENDING), ("id", ASCENDING)]
+PRODUCT_SORT_KEYS = [key for key, _ in PRODUCT_SORT]
+# Python type of each sort key, checked when decoding page cursors
+PRODUCT_SORT_TYPES = (bool, str, int)
+
+class PoolMonitor(ConnectionPoolListener):
+    """Tracks connection pool usage for the readiness endpoint"""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self.cleared = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open = max(self.open - 1, 0)
+
+    def connection_check_out_started(self, event):
+        self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        self.waiting = max(self.waiting - 1, 0)
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.waiting = max(self.waiting - 1, 0)
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out = max(self.checked_out - 1, 0)
+
+    def stats(self, max_pool_size: int) -> Dict[str, Any]:
+        return {
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "waiting": self.waiting,
+            "max_pool_size": max_pool_size,
+            "saturation": round(self.checked_out / max_pool_size, 3) if max_pool_size else 0,
+            "checkout_failures": self.checkout_failures,
+            "cleared": self.cleared
+        }
+
+
+@instrument
 class Database:
     _client = None
     _db = None
+    _pool_monitor = None
+    _command_metrics = CommandMetrics()
+    _options: Dict[str, Any] = {}
+    ready = False
+
+    # backend/.env setting -> (client option, type, default); None leaves the driver default
+    CLIENT_SETTINGS = {
+        'MONGO_MAX_POOL_SIZE': ('maxPoolSize', int, 100),
+        'MONGO_MIN_POOL_SIZE': ('minPoolSize', int, 10),
+        'MONGO_MAX_IDLE_TIME_MS': ('maxIdleTimeMS', int, 60000),
+        'MONGO_WAIT_QUEUE_TIMEOUT_MS': ('waitQueueTimeoutMS', int, 2000),
+        'MONGO_SERVER_SELECTION_TIMEOUT_MS': ('serverSelectionTimeoutMS', int, 5000),
+        'MONGO_CONNECT_TIMEOUT_MS': ('connectTimeoutMS', int, 5000),
+        'MONGO_SOCKET_TIMEOUT_MS': ('socketTimeoutMS', int, 10000),
+        'MONGO_COMPRESSORS': ('compressors', str, None),
+        'MONGO_READ_PREFERENCE': ('readPreference', str, None),
+        'MONGO_APP_NAME': ('appname', str, 'thunder-services-api'),
+    }
+
+    @classmethod
+    def client_options(cls) -> Dict[str, Any]:
+        """Motor client keyword arguments from the environment"""
+        options = {}
+        for setting, (option, cast, default) in cls.CLIENT_SETTINGS.items():
+            value = os.environ.get(setting)
+            if value not in (None, ""):
+                options[option] = cast(value)
+            elif default is not None:
+                options[option] = default
+        return options
     
     @classmethod
     def get_db(cls):
         if cls._client is None:
             mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
             db_name = os.environ.get('DB_NAME', 'test_database')
-            cls._client = AsyncIOMotorClient(mongo_url)
+            cls._options = cls.client_options()
+            cls._pool_monitor = PoolMonitor()
+            cls._client = AsyncIOMotorClient(
+                mongo_url, event_listeners=[cls._pool_monitor, cls._command_metrics], **cls._options
+            )
             cls._db = cls._client[db_name]
         return cls._db
+
+    @classmethod
+    async def ping(cls, timeout: float = 2.0) -> bool:
+        """Round trip to the server, bounded by timeout seconds
+
+        A success also marks the database ready, so a worker whose start-up
+        wait ran out recovers as soon as Mongo answers again.
+        """
+        try:
+            await asyncio.wait_for(cls.get_db().command("ping"), timeout)
+        except Exception:
+            return False
+        cls.ready = True
+        return True
+
+    @classmethod
+    async def warm_up(cls) -> bool:
+        """Wait for Mongo with backoff (MONGO_STARTUP_TIMEOUT_S), then pre-open pool connections"""
+        deadline = asyncio.get_running_loop().time() + float(os.environ.get('MONGO_STARTUP_TIMEOUT_S', 30))
+        delay = 0.25
+        while not await cls.ping(timeout=5.0):
+            if asyncio.get_running_loop().time() + delay > deadline:
+                logger.error("MongoDB not reachable, starting without database readiness")
+                cls.ready = False
+                return False
+            logger.warning(f"MongoDB not reachable yet, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
+        # Concurrent pings force the pool to open that many sockets before traffic arrives
+        warm = cls._options.get('minPoolSize', 0)
+        if warm:
+            await asyncio.gather(*(cls.ping(timeout=5.0) for _ in range(warm)))
+        cls.ready = True
+        logger.info(f"MongoDB ready, {cls.pool_stats().get('open', 0)} pooled connections open")
+        return True
+
+    @classmethod
+    def pool_stats(cls) -> Dict[str, Any]:
+        """Connection pool usage for this process"""
+        if cls._pool_monitor is None:
+            return {}
+        return cls._pool_monitor.stats(cls._options.get('maxPoolSize', 100))
     
     @classmethod
     def get_collections(cls):
@@ -22,17 +171,115 @@ class Database:
         return {
             'products': db.products,
             'testimonials': db.testimonials,
-            'analytics': db.analytics
+            'analytics': db.analytics,
+            'click_counters': db.click_counters,
+            'analytics_rollups': db.analytics_rollups,
+            'visitor_sketches': db.visitor_sketches,
+            'counters': db.counters,
+            'images': db.images
         }
 
+    # Sequence operations
+    _synced_sequences = set()
+
+    @classmethod
+    async def sync_sequence(cls, name: str):
+        """Raise the sequence for a collection to at least its highest existing id"""
+        collections = cls.get_collections()
+        latest = await collections[name].find_one({}, {"id": 1}, sort=[("id", DESCENDING)])
+        await cls.raise_sequence(name, latest["id"] if latest else 0)
+        cls._synced_sequences.add(name)
+
+    @classmethod
+    async def raise_sequence(cls, name: str, highest: int):
+        """Make sure ids allocated from now on are above highest (an id already in use)"""
+        collections = cls.get_collections()
+        # $max never moves the sequence backwards, so concurrent raises are harmless
+        await collections['counters'].update_one(
+            {"_id": name}, {"$max": {"seq": highest}}, upsert=True
+        )
+
+    @classmethod
+    async def allocate_ids(cls, name: str, count: int = 1) -> range:
+        """Atomically reserve a block of count consecutive ids for a collection"""
+        if count < 1:
+            return range(0)
+        if name not in cls._synced_sequences:
+            await cls.sync_sequence(name)
+        collections = cls.get_collections()
+        counter = await collections['counters'].find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        last = counter["seq"]
+        return range(last - count + 1, last + 1)
+
+    @classmethod
+    async def next_id(cls, name: str) -> int:
+        """Next id for a collection, unique even under concurrent writers"""
+        return (await cls.allocate_ids(name, 1))[0]
+
+    @staticmethod
+    async def bump_version(name: str) -> int:
+        """Increment a shared version stamp (kept alongside the id sequences)"""
+        collections = Database.get_collections()
+        stamp = await collections['counters'].find_one_and_update(
+            {"_id": f"version:{name}"},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return stamp["seq"]
+
+    @staticmethod
+    async def get_versions(names: Iterable[str]) -> Dict[str, int]:
+        """Current version stamps; names never bumped are at 0"""
+        collections = Database.get_collections()
+        names = list(names)
+        cursor = collections['counters'].find({"_id": {"$in": [f"version:{name}" for name in names]}})
+        versions = {name: 0 for name in names}
+        async for stamp in cursor:
+            versions[stamp["_id"].split(":", 1)[1]] = stamp["seq"]
+        return versions
+
     # Product operations
     @staticmethod
-    async def get_all_products() -> List[Product]:
-        """Get all products, with featured (watches) first"""
+    def find_products(
+        category: Optional[str] = None,
+        featured: Optional[bool] = None,
+        after: Optional[Sequence[Any]] = None,
+        fields: Optional[Iterable[str]] = None,
+        limit: int = 0,
+        batch_size: int = 200
+    ):
+        """Cursor over products in display order, without buffering the result
+
+        after is the (featured, category, id) of the last product already seen;
+        fields limits the projection (the sort keys are always included).
+        """
         collections = Database.get_collections()
-        cursor = collections['products'].find().sort([("featured", -1), ("category", 1), ("id", 1)])
-        products = await cursor.to_list(1000)
-        return [Product(**product) for product in products]
+        query: Dict[str, Any] = {}
+        if category is not None:
+            query["category"] = category
+        if featured is not None:
+            query["featured"] = featured
+        if after is not None:
+            # Keyset continuation matching PRODUCT_SORT
+            last_featured, last_category, last_id = after
+            query["$or"] = [
+                {"featured": {"$lt": last_featured}},
+                {"featured": last_featured, "category": {"$gt": last_category}},
+                {"featured": last_featured, "category": last_category, "id": {"$gt": last_id}},
+            ]
+        projection = {"_id": 0, "created_at": 0}
+        if fields is not None:
+            projection = {"_id": 0, **{field: 1 for field in (*fields, *PRODUCT_SORT_KEYS)}}
+        cursor = collections['products'].find(query, projection).sort(PRODUCT_SORT)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor.batch_size(batch_size)
     
     @staticmethod
     async def create_product(product: Product) -> Product:
@@ -51,15 +298,25 @@ class Database:
             return Product(**product)
         return None
 
+    @staticmethod
+    async def update_product_image(product_id: int, image_url: str) -> bool:
+        """Point a product at a new image; False if the product does not exist"""
+        collections = Database.get_collections()
+        result = await collections['products'].update_one(
+            {"id": product_id}, {"$set": {"image": image_url}}
+        )
+        return result.matched_count == 1
+
     # Testimonial operations
     @staticmethod
-    async def get_all_testimonials() -> List[Testimonial]:
-        """Get all approved testimonials"""
+    def find_testimonials(fields: Optional[Iterable[str]] = None):
+        """Cursor over approved testimonials by id; fields limits the projection"""
         collections = Database.get_collections()
-        cursor = collections['testimonials'].find({"approved": True}).sort("id", 1)
-        testimonials = await cursor.to_list(1000)
-        return [Testimonial(**testimonial) for testimonial in testimonials]
-    
+        projection = {"_id": 0, "created_at": 0}
+        if fields is not None:
+            projection = {"_id": 0, **{field: 1 for field in fields}}
+        return collections['testimonials'].find({"approved": True}, projection).sort("id", 1)
+
     @staticmethod
     async def create_testimonial(testimonial: Testimonial) -> Testimonial:
         """Create a new testimonial"""
@@ -68,37 +325,131 @@ class Database:
         await collections['testimonials'].insert_one(testimonial_dict)
         return testimonial
 
+    @staticmethod
+    async def update_testimonial_image(testimonial_id: int, image_url: str) -> bool:
+        """Point a testimonial at a new review image; False if it does not exist"""
+        collections = Database.get_collections()
+        result = await collections['testimonials'].update_one(
+            {"id": testimonial_id}, {"$set": {"review_image": image_url}}
+        )
+        return result.matched_count == 1
+
+    @staticmethod
+    async def testimonial_exists(testimonial_id: int) -> bool:
+        collections = Database.get_collections()
+        return await collections['testimonials'].count_documents({"id": testimonial_id}, limit=1) > 0
+
     # Analytics operations
     @staticmethod
-    async def track_telegram_click(click_data: TelegramClick) -> bool:
-        """Track telegram button click"""
-        try:
-            collections = Database.get_collections()
-            click_dict = click_data.dict()
-            await collections['analytics'].insert_one(click_dict)
-            return True
-        except Exception as e:
-            print(f"Error tracking telegram click: {e}")
-            return False
-    
+    async def track_events(events: List[Union[TelegramClick, PageView]]) -> int:
+        """Insert a batch of analytics events (clicks, page views), returning how many were written"""
+        if not events:
+            return 0
+        collections = Database.get_collections()
+        result = await collections['analytics'].insert_many(
+            [event.dict() for event in events], ordered=False
+        )
+        return len(result.inserted_ids)
+
+    FUNNEL_WINDOWS = {"hour": "%Y-%m-%dT%H", "day": "%Y-%m-%d", "week": "%G-W%V", "all": None}
+
     @staticmethod
-    async def get_telegram_clicks_count() -> int:
-        """Get total telegram clicks count"""
+    async def get_funnel(since: datetime, window: str = "all") -> List[Dict[str, Any]]:
+        """Page views, telegram clicks and view->click conversion per source and time window
+
+        A single $group over the raw events; only one row per (window, source)
+        leaves the server. Events stored before sources were recorded are
+        grouped as "unattributed".
+        """
         collections = Database.get_collections()
-        count = await collections['analytics'].count_documents({"event": "telegram_click"})
-        return count
+        group_id: Dict[str, Any] = {"source": {"$ifNull": ["$source", "unattributed"]}}
+        window_format = Database.FUNNEL_WINDOWS[window]
+        if window_format:
+            group_id["window"] = {"$dateToString": {"format": window_format, "date": "$timestamp"}}
+        pipeline = [
+            {"$match": {
+                "event": {"$in": ["page_view", "telegram_click"]},
+                "timestamp": {"$gte": since},
+            }},
+            {"$group": {
+                "_id": group_id,
+                "views": {"$sum": {"$cond": [{"$eq": ["$event", "page_view"]}, 1, 0]}},
+                "clicks": {"$sum": {"$cond": [{"$eq": ["$event", "telegram_click"]}, 1, 0]}},
+            }},
+            {"$project": {
+                "_id": 0,
+                "window": "$_id.window",
+                "source": "$_id.source",
+                "views": 1,
+                "clicks": 1,
+                "conversion": {"$cond": [
+                    {"$gt": ["$views", 0]}, {"$divide": ["$clicks", "$views"]}, None
+                ]},
+            }},
+            {"$sort": {"window": 1, "views": -1, "source": 1}},
+        ]
+        return await collections['analytics'].aggregate(pipeline).to_list(None)
 
-    # Database seeding
+    # Dashboard aggregates
     @staticmethod
-    async def seed_products():
-        """Seed database with updated product data - no prices, no images"""
-        # Check if products already exist
+    async def get_catalog_summary() -> Dict[str, Any]:
+        """Product counts per category and testimonial stats, one aggregation per collection"""
         collections = Database.get_collections()
-        existing_count = await collections['products'].count_documents({})
-        if existing_count > 0:
-            print("Products already exist, skipping seed")
-            return
+        product_pipeline = [
+            {"$group": {
+                "_id": "$category",
+                "count": {"$sum": 1},
+                "featured": {"$sum": {"$cond": [{"$eq": ["$featured", True]}, 1, 0]}},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        testimonial_pipeline = [
+            {"$match": {"approved": True}},
+            {"$group": {"_id": None, "total": {"$sum": 1}, "average_rating": {"$avg": "$rating"}}},
+        ]
+        categories, testimonials = await asyncio.gather(
+            collections['products'].aggregate(product_pipeline).to_list(None),
+            collections['testimonials'].aggregate(testimonial_pipeline).to_list(None),
+        )
+        testimonials = testimonials[0] if testimonials else {}
+        return {
+            "products": {
+                "total": sum(category["count"] for category in categories),
+                "featured": sum(category["featured"] for category in categories),
+                "categories": {category["_id"]: category["count"] for category in categories},
+            },
+            "testimonials": {
+                "total": testimonials.get("total", 0),
+                "average_rating": testimonials.get("average_rating") or 0,
+            },
+        }
+
+    # Database seeding
+    @staticmethod
+    async def upsert_seed(name: str, documents: List[Dict[str, Any]]) -> int:
+        """Seed an empty collection in one round trip; returns the number of documents added
+
+        A collection with any documents is left alone, so seed documents an
+        admin deleted stay deleted. Workers racing on an empty collection are
+        harmless: $setOnInsert keyed on id inserts each seed document once.
+        """
+        collection = Database.get_collections()[name]
+        if await collection.find_one({}, {"_id": 1}) is not None:
+            print(f"{name.capitalize()} already exist, skipping seed")
+            return 0
+        requests = [UpdateOne({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True) for doc in documents]
+        try:
+            result = await collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            # Another worker upserted the same ids first
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            return e.details.get("nUpserted", 0)
+        return result.upserted_count
 
+    @staticmethod
+    async def seed_products() -> int:
+        """Seed database with updated product data - no prices, no images"""
         seed_products = [
             # Watches (featured) - Updated Spanish names
             Product(id=1, name="Relojes minimalistas", category="relojes", featured=True, image="/images/omega1.JPG"),
@@ -114,21 +465,14 @@ class Database:
             Product(id=9, name="Sneakers basket", category="zapatillas", image="/images/jordan4.JPG")
         ]
 
-        for product in seed_products:
-            await Database.create_product(product)
-        
-        print(f"Seeded {len(seed_products)} products (no prices, placeholder images)")
+        added = await Database.upsert_seed('products', [product.dict() for product in seed_products])
+        if added:
+            print(f"Seeded {added} products (no prices, placeholder images)")
+        return added
 
     @staticmethod
-    async def seed_testimonials():
+    async def seed_testimonials() -> int:
         """Seed database with updated testimonial data - Spanish reviews"""
-        collections = Database.get_collections()
-        # Check if testimonials already exist
-        existing_count = await collections['testimonials'].count_documents({})
-        if existing_count > 0:
-            print("Testimonials already exist, skipping seed")
-            return
-
         seed_testimonials = [
             Testimonial(
                 id=1, 
@@ -168,17 +512,25 @@ class Database:
             )
         ]
 
-        for testimonial in seed_testimonials:
-            await Database.create_testimonial(testimonial)
-        
-        print(f"Seeded {len(seed_testimonials)} testimonials (Spanish reviews, ready for images)")
+        added = await Database.upsert_seed('testimonials', [testimonial.dict() for testimonial in seed_testimonials])
+        if added:
+            print(f"Seeded {added} testimonials (Spanish reviews, ready for images)")
+        return added
 
     @staticmethod
-    async def seed_all():
-        """Seed all collections"""
-        await Database.seed_products()
-        await Database.seed_testimonials()
+    async def seed_all() -> bool:
+        """Seed all collections with idempotent bulk upserts, one per collection
+
+        Returns True when any seed document was added, i.e. cached catalog
+        responses are stale.
+        """
+        added = await Database.seed_products() + await Database.seed_testimonials()
+        if added:
+            # Seeds use fixed ids; keep the sequences ahead of them
+            await Database.sync_sequence('products')
+            await Database.sync_sequence('testimonials')
         print("Database seeding completed")
+        return added > 0
         
     @classmethod
     def close_connection(cls):
@@ -186,4 +538,185 @@ class Database:
         if cls._client:
             cls._client.close()
             cls._client = None
-            cls._db = None
\ No newline at end of file
+            cls._db = None
+            cls.ready = False
+
+
+class IndexManager:
+    """Declares the indexes behind every Database query and checks their plans"""
+
+    # Server codes for an existing index with the same name/keys but other options
+    _CONFLICT_CODES = (85, 86)
+    # Indexes earlier versions created, dropped at startup. The analytics TTL index
+    # expired clicks by age alone, even ones not yet rolled up
+    RETIRED = {'analytics': ('timestamp_ttl',)}
+
+    @staticmethod
+    def analytics_ttl_days() -> int:
+        """Days raw analytics events are kept at least (ANALYTICS_TTL_DAYS); 0 means forever
+
+        Expiry is AnalyticsRollup.expire, not a TTL index, so clicks are
+        never deleted before they are rolled up.
+        """
+        return int(os.environ.get('ANALYTICS_TTL_DAYS', 0))
+
+    @staticmethod
+    def declared() -> Dict[str, List[IndexModel]]:
+        """Indexes per collection"""
+        indexes = {
+            'products': [
+                IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+                IndexModel(PRODUCT_SORT, name="featured_category_id"),
+            ],
+            'testimonials': [
+                IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+                IndexModel([("approved", ASCENDING), ("id", ASCENDING)], name="approved_id"),
+            ],
+            'analytics': [
+                IndexModel([("event", ASCENDING), ("timestamp", ASCENDING)], name="event_timestamp"),
+            ],
+            'click_counters': [
+                IndexModel([("kind", ASCENDING), ("_id", ASCENDING)], name="kind_id"),
+            ],
+            'analytics_rollups': [
+                IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING)], name="granularity_bucket"),
+            ],
+            'visitor_sketches': [
+                IndexModel(
+                    [("event", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)],
+                    name="event_granularity_bucket"
+                ),
+            ],
+        }
+        return indexes
+
+    @classmethod
+    async def ensure_indexes(cls) -> Dict[str, Dict[str, List[str]]]:
+        """Create any missing index; safe to run on every startup
+
+        An index that cannot be built (e.g. id_unique over duplicate ids) is
+        logged and listed under "failed"; the others are still created.
+        """
+        collections = Database.get_collections()
+        for name, index_names in cls.RETIRED.items():
+            existing = await collections[name].index_information()
+            for index_name in index_names:
+                if index_name in existing:
+                    await collections[name].drop_index(index_name)
+                    logger.info(f"Dropped retired index {name}.{index_name}")
+        created, failed = {}, {}
+        for name, models in cls.declared().items():
+            collection = collections[name]
+            created[name] = []
+            for model in models:
+                try:
+                    created[name] += await collection.create_indexes([model])
+                except OperationFailure as e:
+                    if e.code in cls._CONFLICT_CODES:
+                        await cls._resolve_conflict(collection, model, e)
+                        continue
+                    logger.error(f"Could not build index {name}.{model.document['name']}: {e}")
+                    failed.setdefault(name, []).append(model.document['name'])
+        logger.info(f"Indexes ensured: {created}")
+        return {"created": created, "failed": failed}
+
+    @staticmethod
+    async def _resolve_conflict(collection, model: IndexModel, error: OperationFailure):
+        spec = model.document
+        logger.warning(f"Index {collection.name}.{spec['name']} differs from declaration: {error}")
+
+    @staticmethod
+    def queries() -> List[Dict[str, Any]]:
+        """The query shapes Database and the admin endpoints issue"""
+        return [
+            {"name": "find_products", "collection": "products", "filter": {},
+             "sort": PRODUCT_SORT},
+            {"name": "find_products_page", "collection": "products",
+             "filter": {"category": "relojes", "$or": [
+                 {"featured": {"$lt": True}},
+                 {"featured": True, "category": {"$gt": "relojes"}},
+                 {"featured": True, "category": "relojes", "id": {"$gt": 1}},
+             ]},
+             "sort": PRODUCT_SORT},
+            {"name": "get_product_by_id", "collection": "products", "filter": {"id": 1}},
+            {"name": "find_testimonials", "collection": "testimonials",
+             "filter": {"approved": True}, "sort": [("id", 1)]},
+            {"name": "recent_clicks", "collection": "click_counters",
+             "filter": {"kind": "hour", "_id": {"$gte": "hour:1970-01-01T00"}}},
+            {"name": "click_counter", "collection": "click_counters", "filter": {"_id": "total"}},
+            {"name": "click_counters_by_kind", "collection": "click_counters",
+             "filter": {"kind": "device"}, "sort": [("_id", 1)]},
+            {"name": "funnel", "collection": "analytics",
+             "filter": {"event": {"$in": ["page_view", "telegram_click"]},
+                        "timestamp": {"$gte": datetime(1970, 1, 1)}}},
+            {"name": "visitor_sketches", "collection": "visitor_sketches",
+             "filter": {"event": "telegram_click", "granularity": "day",
+                        "bucket": {"$gte": datetime(1970, 1, 1)}}},
+            {"name": "rollup_series", "collection": "analytics_rollups",
+             "filter": {"granularity": "day", "bucket": {"$gte": datetime(1970, 1, 1)}}},
+        ]
+
+    @staticmethod
+    def _stages(plan: Any) -> List[str]:
+        """All stage names in an explain plan tree"""
+        stages = []
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(plan["stage"])
+            for value in plan.values():
+                stages += IndexManager._stages(value)
+        elif isinstance(plan, list):
+            for value in plan:
+                stages += IndexManager._stages(value)
+        return stages
+
+    @classmethod
+    async def check(cls) -> List[Dict[str, Any]]:
+        """Explain every declared query and flag those whose winning plan is a COLLSCAN"""
+        collections = Database.get_collections()
+        report = []
+        for query in cls.queries():
+            cursor = collections[query["collection"]].find(query["filter"])
+            if query.get("sort"):
+                cursor = cursor.sort(query["sort"])
+            explain = await cursor.explain()
+            stages = cls._stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+            report.append({
+                "query": query["name"],
+                "collection": query["collection"],
+                "stages": stages,
+                "collscan": "COLLSCAN" in stages
+            })
+        for entry in report:
+            if entry["collscan"]:
+                logger.warning(f"Query {entry['query']} on {entry['collection']} does a COLLSCAN")
+        return report
+
+
+if __name__ == "__main__":
+    # Create indexes, then seed or report query plans: python database.py [--seed] [--check]
+    import asyncio
+    import json
+    import sys
+    from pathlib import Path
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        failed = (await IndexManager.ensure_indexes())["failed"]
+        if "--seed" in sys.argv and await Database.seed_all():
+            # Running workers drop their cached catalog on the next stamp sync
+            from cache import CatalogCache
+            for key in CatalogCache.KEYS:
+                await Database.bump_version(f"catalog:{key}")
+        if "--check" in sys.argv:
+            report = await IndexManager.check()
+            print(json.dumps(report, indent=2))
+            return 1 if failed or any(entry["collscan"] for entry in report) else 0
+        return 1 if failed else 0
+
+    code = asyncio.run(main())
+    Database.close_connection()
+    sys.exit(code)
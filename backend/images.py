@@ -0,0 +1,241 @@
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from database import Database
+from compression import COMPRESSIBLE_TYPES, brotli, compress
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+
+# Widths the client can choose from; never upscaled past the source width
+IMAGE_WIDTHS = (320, 640, 960, 1280)
+# Smallest first, so srcset consumers see the cheapest format first
+IMAGE_FORMATS = (
+    ("avif", "AVIF", {"quality": 50, "speed": 8}),
+    ("webp", "WEBP", {"quality": 75, "method": 4}),
+    ("jpeg", "JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+)
+PLACEHOLDER_WIDTH = 16
+MEDIA_URL_PREFIX = "/api/media/"
+
+
+class ImageStore:
+    """Content-addressed files under IMAGE_STORE_DIR, served at MEDIA_URL_PREFIX"""
+
+    @staticmethod
+    def root() -> Path:
+        root = Path(os.environ.get('IMAGE_STORE_DIR', ROOT_DIR / 'media'))
+        root.mkdir(parents=True, exist_ok=True)
+        return root
+
+    @staticmethod
+    def source_root() -> Path:
+        """Where seeded /images/... URLs live (the frontend public folder)"""
+        return Path(os.environ.get('IMAGE_SOURCE_DIR', ROOT_DIR.parent / 'frontend' / 'public'))
+
+    @classmethod
+    def resolve(cls, url: Optional[str]) -> Optional[Path]:
+        """Local file behind an image URL, or None for external/missing images"""
+        if not url or "://" in url:
+            return None
+        if url.startswith(MEDIA_URL_PREFIX):
+            root, relative = cls.root(), url[len(MEDIA_URL_PREFIX):]
+        else:
+            root, relative = cls.source_root(), url.lstrip("/")
+        root = root.resolve()
+        path = (root / relative).resolve()
+        # ".." segments or symlinks must not reach files outside the root
+        if not path.is_relative_to(root):
+            return None
+        return path if path.is_file() else None
+
+    @staticmethod
+    def url(name: str) -> str:
+        return MEDIA_URL_PREFIX + name
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        # Write then rename so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    @classmethod
+    def put(cls, data: bytes, extension: str) -> str:
+        """Store bytes under their sha256; existing identical content is reused
+
+        Compressible types (SVG, JSON, text) also get .br/.gz siblings so the
+        media endpoint can serve them without compressing per request.
+        """
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = cls.root() / name
+        if not path.exists():
+            cls._write(path, data)
+            content_type = mimetypes.guess_type(name)[0] or ""
+            if content_type.startswith(COMPRESSIBLE_TYPES):
+                for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+                    if encoding == "br" and brotli is None:
+                        continue
+                    compressed = compress(data, encoding)
+                    if len(compressed) < len(data):
+                        cls._write(path.with_name(name + suffix), compressed)
+        return name
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def variant_widths(width: int) -> List[int]:
+    """Target widths for a source this wide: each smaller IMAGE_WIDTHS entry, then the largest allowed"""
+    return sorted({*(w for w in IMAGE_WIDTHS if w < width), min(width, IMAGE_WIDTHS[-1])})
+
+
+def _render(path: Path) -> Dict[str, Any]:
+    """Decode once, then encode every width/format derivative (CPU bound, runs in a thread)"""
+    # Pillow is only needed by the pipeline, not by the request path
+    from PIL import Image, ImageOps, features
+
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source).convert("RGB")
+    width, height = image.size
+
+    variants = []
+    for target in variant_widths(width):
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS
+        )
+        for extension, pil_format, options in IMAGE_FORMATS:
+            if pil_format == "AVIF" and not features.check("avif"):
+                continue
+            buffer = io.BytesIO()
+            # A fresh save carries no EXIF/ICC/XMP metadata from the source
+            resized.save(buffer, pil_format, **options)
+            data = buffer.getvalue()
+            variants.append({
+                "url": ImageStore.url(ImageStore.put(data, extension)),
+                "width": resized.width,
+                "height": resized.height,
+                "format": extension,
+                "bytes": len(data)
+            })
+
+    tiny = image.resize(
+        (PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))), Image.BILINEAR
+    )
+    buffer = io.BytesIO()
+    tiny.save(buffer, "WEBP", quality=30)
+    placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    return {"width": width, "height": height, "placeholder": placeholder, "variants": variants}
+
+
+def srcsets(variants: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+    """format -> "url 320w, url 640w, ..." for <picture>/<source> elements"""
+    grouped: Dict[str, List[str]] = {}
+    for variant in sorted(variants, key=lambda v: v["width"]):
+        grouped.setdefault(variant["format"], []).append(f"{variant['url']} {variant['width']}w")
+    return {fmt: ", ".join(entries) for fmt, entries in grouped.items()}
+
+
+class ImagePipeline:
+    """Generates derivatives for catalog images and keeps their manifests in the images collection"""
+
+    # Decoding/encoding is CPU heavy; keep it off most cores
+    _semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    async def process(cls, url: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Derivatives for one image URL, regenerated only when the source changed"""
+        manifest, _ = await cls._process(url, force)
+        return manifest
+
+    @classmethod
+    async def _process(cls, url: str, force: bool) -> Tuple[Optional[Dict[str, Any]], bool]:
+        path = ImageStore.resolve(url)
+        if path is None:
+            return None, False
+        source_hash = await asyncio.to_thread(file_sha256, path)
+        collections = Database.get_collections()
+        existing = await collections['images'].find_one({"_id": url})
+        if existing and existing.get("source_sha256") == source_hash and not force:
+            return existing, False
+
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(int(os.environ.get('IMAGE_WORKERS', 2)))
+        async with cls._semaphore:
+            rendered = await asyncio.to_thread(_render, path)
+        manifest = {"_id": url, "source_sha256": source_hash, **rendered}
+        await collections['images'].replace_one({"_id": url}, manifest, upsert=True)
+        logger.info(f"Processed {url}: {len(rendered['variants'])} variants")
+        return manifest, True
+
+    @classmethod
+    async def process_catalog(cls, force: bool = False) -> Dict[str, int]:
+        """Process every image referenced by products and testimonials"""
+        collections = Database.get_collections()
+        urls = set(await collections['products'].distinct("image"))
+        urls |= set(await collections['testimonials'].distinct("review_image"))
+        urls.discard(None)
+        ordered = sorted(urls)
+        results = await asyncio.gather(
+            *(cls._process(url, force) for url in ordered), return_exceptions=True
+        )
+        summary = {"images": len(ordered), "generated": 0, "unchanged": 0, "missing": 0, "failed": 0}
+        for url, result in zip(ordered, results):
+            if isinstance(result, Exception):
+                summary["failed"] += 1
+                logger.error(f"Error processing image {url}: {result}")
+            elif result[0] is None:
+                summary["missing"] += 1
+            else:
+                summary["generated" if result[1] else "unchanged"] += 1
+        return summary
+
+    @staticmethod
+    async def manifests(urls: Iterable[Optional[str]]) -> Dict[str, Dict[str, Any]]:
+        """Stored manifests for the given image URLs, keyed by URL"""
+        wanted = sorted({url for url in urls if url})
+        if not wanted:
+            return {}
+        collections = Database.get_collections()
+        cursor = collections['images'].find({"_id": {"$in": wanted}}, {"source_sha256": 0})
+        return {doc["_id"]: doc async for doc in cursor}
+
+    @staticmethod
+    def image_info(manifest: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Response shape (see models.ImageInfo) for a stored manifest"""
+        if not manifest:
+            return None
+        return {
+            "width": manifest["width"],
+            "height": manifest["height"],
+            "placeholder": manifest.get("placeholder"),
+            "variants": manifest["variants"],
+            "srcset": srcsets(manifest["variants"])
+        }
+
+
+if __name__ == "__main__":
+    # Generate derivatives for every catalog image: python images.py [--force] (from backend/)
+    import sys
+    from dotenv import load_dotenv
+
+    load_dotenv(ROOT_DIR / '.env')
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(ImagePipeline.process_catalog(force="--force" in sys.argv)))
+    Database.close_connection()
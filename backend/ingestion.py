@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+
+from pymongo.errors import BulkWriteError
+
+from models import TelegramClick, PageView
+from database import Database
+from counters import ClickCounters
+from visitors import VisitorSketches
+from useragent import is_bot
+
+logger = logging.getLogger(__name__)
+
+# Queued after the last click on shutdown so the flusher drains and exits
+_STOP = object()
+
+
+class DedupWindow:
+    """Keys seen in the last window seconds, in first-seen order, capped at max_keys
+
+    Lookups, inserts and expiry are O(1); when a spike fills the table the
+    oldest keys go first, which at worst lets an old duplicate through.
+    """
+
+    def __init__(self, window: float, max_keys: int):
+        self.window = window
+        self.max_keys = max_keys
+        self._seen: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def seen(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """True if key was already seen within the window; otherwise remember it"""
+        now = time.monotonic() if now is None else now
+        horizon = now - self.window
+        seen = self._seen
+        while seen:
+            first_seen = next(iter(seen.values()))
+            if first_seen > horizon and len(seen) < self.max_keys:
+                break
+            seen.popitem(last=False)
+        if key in seen:
+            return True
+        seen[key] = now
+        return False
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class ClickIngestor:
+    """Buffers analytics events (telegram clicks, page views) in memory and writes them with insert_many"""
+    _queue: Optional[asyncio.Queue] = None
+    _task: Optional[asyncio.Task] = None
+    _closed = False
+
+    max_queue = 10000
+    batch_size = 500
+    flush_interval = 1.0
+
+    _accepted = 0
+    _dropped = 0
+    _written = 0
+    _failed = 0
+    _batches = 0
+
+    dedup_window = 10.0
+    dedup_max_keys = 100000
+    _dedup: Optional[DedupWindow] = None
+    # (reason, event) -> events filtered since counters were last persisted
+    _filtered: Counter = Counter()
+    _filtered_total: Counter = Counter()
+
+    @classmethod
+    def configure(cls):
+        """Read limits from the environment (CLICK_QUEUE_MAX, CLICK_BATCH_SIZE, CLICK_FLUSH_INTERVAL,
+        CLICK_DEDUP_WINDOW_S, CLICK_DEDUP_MAX_KEYS)"""
+        cls.max_queue = int(os.environ.get('CLICK_QUEUE_MAX', cls.max_queue))
+        cls.batch_size = int(os.environ.get('CLICK_BATCH_SIZE', cls.batch_size))
+        cls.flush_interval = float(os.environ.get('CLICK_FLUSH_INTERVAL', cls.flush_interval))
+        cls.dedup_window = float(os.environ.get('CLICK_DEDUP_WINDOW_S', cls.dedup_window))
+        cls.dedup_max_keys = int(os.environ.get('CLICK_DEDUP_MAX_KEYS', cls.dedup_max_keys))
+        cls._dedup = DedupWindow(cls.dedup_window, cls.dedup_max_keys)
+
+    @classmethod
+    def admit(cls, event: Union[TelegramClick, PageView]) -> Optional[str]:
+        """None if the event should be stored, else why not ("bot" or "duplicate")
+
+        Filtered events are only counted. A duplicate is the same visitor
+        sending the same event (same path for page views) within the dedup
+        window: double taps, retries, reloads.
+        """
+        if cls._dedup is None:
+            cls.configure()
+        reason = None
+        if is_bot(event.user_agent):
+            reason = "bot"
+        elif event.visitor and cls.dedup_window > 0:
+            key: Tuple[Any, ...] = (event.event, event.visitor, getattr(event, "path", None))
+            if cls._dedup.seen(key):
+                reason = "duplicate"
+        if reason is not None:
+            cls._filtered[(reason, event.event)] += 1
+            cls._filtered_total[(reason, event.event)] += 1
+        return reason
+
+    @classmethod
+    async def _persist_filtered(cls):
+        if not cls._filtered:
+            return
+        counts, cls._filtered = cls._filtered, Counter()
+        try:
+            await ClickCounters.record_filtered(counts)
+        except Exception as e:
+            cls._filtered.update(counts)
+            logger.error(f"Error updating filtered event counters: {e}")
+
+    @classmethod
+    def start(cls):
+        """Start the background flusher on the running event loop"""
+        if cls.running():
+            return
+        cls.configure()
+        # One extra slot so the stop marker always fits behind a full queue
+        cls._queue = asyncio.Queue(maxsize=cls.max_queue + 1)
+        cls._closed = False
+        cls._task = asyncio.get_running_loop().create_task(cls._run())
+        logger.info(
+            f"Click ingestion started (queue={cls.max_queue}, batch={cls.batch_size}, "
+            f"interval={cls.flush_interval}s)"
+        )
+
+    @classmethod
+    def running(cls) -> bool:
+        return cls._task is not None and not cls._task.done() and not cls._closed
+
+    @classmethod
+    def submit(cls, event: Union[TelegramClick, PageView]) -> bool:
+        """Queue an event without waiting; returns False when it had to be dropped"""
+        if cls._closed or cls._queue is None or cls._queue.qsize() >= cls.max_queue:
+            cls._dropped += 1
+            return False
+        cls._queue.put_nowait(event)
+        cls._accepted += 1
+        return True
+
+    @classmethod
+    async def _run(cls):
+        loop = asyncio.get_running_loop()
+        queue = cls._queue
+        stopping = False
+        while not stopping:
+            try:
+                item = await asyncio.wait_for(queue.get(), cls.flush_interval)
+            except asyncio.TimeoutError:
+                # Idle (or everything is being filtered): still persist filtered counts
+                await cls._persist_filtered()
+                continue
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + cls.flush_interval
+            while len(batch) < cls.batch_size:
+                if queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await cls.write(batch)
+
+    @classmethod
+    async def write(cls, batch: List[Union[TelegramClick, PageView]]) -> int:
+        """Write one batch and update counters; failures are counted, never raised"""
+        cls._batches += 1
+        try:
+            await Database.track_events(batch)
+            written = batch
+        except BulkWriteError as e:
+            failed = {err['index'] for err in e.details.get('writeErrors', [])}
+            written = [event for i, event in enumerate(batch) if i not in failed]
+            logger.error(f"Partial event batch write ({len(written)}/{len(batch)}): {e}")
+        except Exception as e:
+            written = []
+            logger.error(f"Error writing event batch of {len(batch)}: {e}")
+        cls._written += len(written)
+        cls._failed += len(batch) - len(written)
+        try:
+            await ClickCounters.record(event for event in written if event.event == "telegram_click")
+        except Exception as e:
+            logger.error(f"Error updating click counters: {e}")
+        VisitorSketches.add(written)
+        await cls._persist_filtered()
+        return len(written)
+
+    @classmethod
+    async def stop(cls, timeout: float = 10.0):
+        """Stop accepting clicks and flush everything still buffered"""
+        if cls._task is None:
+            return
+        cls._closed = True
+        cls._queue.put_nowait(_STOP)
+        try:
+            await asyncio.wait_for(cls._task, timeout)
+        except asyncio.TimeoutError:
+            lost = cls._queue.qsize()
+            cls._failed += lost
+            logger.error(f"Click ingestion drain timed out, {lost} clicks not written")
+        await cls._persist_filtered()
+        cls._task = None
+        cls._queue = None
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Queue depth and accepted/dropped/written counters"""
+        return {
+            "running": cls.running(),
+            "queued": cls._queue.qsize() if cls._queue is not None else 0,
+            "max_queue": cls.max_queue,
+            "batch_size": cls.batch_size,
+            "flush_interval": cls.flush_interval,
+            "accepted": cls._accepted,
+            "dropped": cls._dropped,
+            "written": cls._written,
+            "failed": cls._failed,
+            "batches": cls._batches,
+            "filtered": {f"{reason}:{event}": n for (reason, event), n in cls._filtered_total.items()},
+            "dedup_window": cls.dedup_window,
+            "dedup_keys": len(cls._dedup) if cls._dedup is not None else 0
+        }
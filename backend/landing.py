@@ -0,0 +1,152 @@
+import os
+from html import escape
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT_DIR = Path(__file__).parent
+FRONTEND_DIR = ROOT_DIR.parent / 'frontend'
+TELEGRAM_URL = "https://t.me/thunderxservices"
+
+ROOT_ELEMENT = '<div id="root"></div>'
+# Read by LandingPage.js instead of fetching /api/products and /api/testimonials
+CATALOG_ELEMENT_ID = "catalog-data"
+
+FALLBACK_TEMPLATE = """<!doctype html>
+<html lang="es">
+    <head>
+        <meta charset="utf-8" />
+        <meta name="viewport" content="width=device-width, initial-scale=1" />
+        <title>Thunder Services - Relojes Premium y Zapatillas</title>
+    </head>
+    <body>
+        <div id="root"></div>
+    </body>
+</html>"""
+
+
+def template_path() -> Optional[Path]:
+    """index.html of the frontend build (with the bundle tags), else the public template
+
+    LANDING_TEMPLATE points at another file. None means FALLBACK_TEMPLATE.
+    """
+    configured = os.environ.get('LANDING_TEMPLATE')
+    if configured:
+        candidates = [Path(configured)]
+    else:
+        candidates = [FRONTEND_DIR / 'build' / 'index.html', FRONTEND_DIR / 'public' / 'index.html']
+    for path in candidates:
+        if path.is_file():
+            return path
+    return None
+
+
+def template_stamp() -> Optional[Tuple[str, int, int]]:
+    """(path, mtime, size) of the template; changes when a frontend deploy rewrites it"""
+    path = template_path()
+    if path is None:
+        return None
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+def load_template() -> str:
+    """Template text, read on every render (once per catalog or template change)"""
+    path = template_path()
+    if path is None:
+        return FALLBACK_TEMPLATE
+    return path.read_text(encoding="utf-8").replace("%PUBLIC_URL%", "")
+
+
+def _product_card(product: Dict[str, Any], featured: bool) -> str:
+    border = "border-thunder-yellow border-2" if featured else "border-gray-800"
+    image = product.get("image")
+    picture = (
+        f'<img src="{escape(image)}" alt="{escape(product["name"])}" '
+        f'class="max-w-full max-h-full object-contain" />'
+        if image else '<p class="text-gray-400">Sin imagen</p>'
+    )
+    return (
+        f'<div class="bg-black {border} rounded-lg overflow-hidden">'
+        f'<div class="w-full h-48 md:h-64 bg-gray-800 flex items-center justify-center">{picture}</div>'
+        f'<div class="p-4"><h3 class="text-lg font-bold">{escape(product["name"])}</h3>'
+        f'<p class="text-xs font-bold text-thunder-yellow">{escape(product["category"].upper())}</p></div>'
+        f'</div>'
+    )
+
+
+def _testimonial_card(testimonial: Dict[str, Any]) -> str:
+    image = testimonial.get("review_image")
+    review = testimonial.get("review")
+    # Stored ratings predate validation; never let one size the page
+    stars = max(0, min(5, testimonial["rating"]))
+    return (
+        f'<div class="bg-black border border-gray-800 rounded-lg p-6">'
+        f'<p class="font-bold">{escape(testimonial["name"])}</p>'
+        f'<p class="text-thunder-yellow" aria-label="{stars} de 5">'
+        f'{"★" * stars}</p>'
+        + (f'<p class="text-gray-300 mt-2">{escape(review)}</p>' if review else "")
+        + (f'<img src="{escape(image)}" alt="Reseña de {escape(testimonial["name"])}" '
+           f'class="mt-4 w-full rounded" loading="lazy" />' if image else "")
+        + '</div>'
+    )
+
+
+def render_markup(products: List[Dict[str, Any]], testimonials: List[Dict[str, Any]]) -> str:
+    """Static first paint of the landing page; React replaces it when the bundle runs"""
+    watches = [p for p in products if p["category"] == "relojes"]
+    others = [p for p in products if p["category"] != "relojes"]
+    telegram = (
+        f'<a href="{TELEGRAM_URL}" target="_blank" rel="noopener noreferrer" '
+        f'class="inline-block bg-thunder-red text-white font-black px-8 py-4 rounded-lg">ÚNETE A TELEGRAM</a>'
+    )
+    sections = [
+        '<section class="min-h-screen flex items-center justify-center px-4 py-20 text-center">'
+        '<div><img src="/thunder-logo.png" alt="Thunder Services Logo" class="h-20 md:h-32 w-auto mx-auto mb-6" />'
+        '<h1 class="text-4xl sm:text-6xl md:text-8xl font-black mb-6 leading-tight">'
+        '<span class="text-thunder-yellow">THUNDER</span><br /><span class="text-thunder-red">SERVICES</span></h1>'
+        '<p class="text-lg sm:text-xl md:text-2xl font-bold text-gray-300 mb-8">'
+        'Destacamos en <span class="text-thunder-yellow">relojes de lujo</span> y '
+        '<span class="text-thunder-red">zapatillas</span>.<br />'
+        'Calidad y ofertas que <span class="text-thunder-red">impactan fuerte</span>.</p>'
+        f'{telegram}</div></section>'
+    ]
+    for title, items, featured in (("RELOJES PREMIUM", watches, True), ("MÁS PRODUCTOS", others, False)):
+        if items:
+            sections.append(
+                f'<section class="py-20 px-4"><div class="container mx-auto max-w-7xl">'
+                f'<h2 class="text-5xl font-black text-center mb-12">{title}</h2>'
+                f'<div class="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-4 md:gap-6">'
+                + "".join(_product_card(product, featured) for product in items)
+                + '</div></div></section>'
+            )
+    if testimonials:
+        sections.append(
+            '<section class="py-20 px-4 bg-gray-950"><div class="container mx-auto max-w-6xl">'
+            '<h2 class="text-5xl font-black text-center mb-12">CLIENTES SATISFECHOS</h2>'
+            '<div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-6">'
+            + "".join(_testimonial_card(testimonial) for testimonial in testimonials)
+            + '</div></div></section>'
+        )
+    return '<div class="min-h-screen bg-black text-white overflow-x-hidden">' + "".join(sections) + '</div>'
+
+
+def render_landing(products: List[Dict[str, Any]], testimonials: List[Dict[str, Any]], catalog_json: bytes) -> bytes:
+    """Landing page HTML: markup inside #root, and the catalog as inline JSON for the app
+
+    catalog_json is {"products": [...], "testimonials": [...]} as served by
+    the API. "<" is escaped so no string in it can close the script element.
+    """
+    template = load_template()
+    data = catalog_json.decode("utf-8").replace("<", "\\u003c")
+    root = (
+        f'<div id="root">{render_markup(products, testimonials)}</div>'
+        f'<script id="{CATALOG_ELEMENT_ID}" type="application/json">{data}</script>'
+    )
+    if ROOT_ELEMENT in template:
+        page = template.replace(ROOT_ELEMENT, root, 1)
+    else:
+        page = template.replace("</body>", root + "</body>", 1)
+    return page.encode("utf-8")
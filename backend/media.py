@@ -0,0 +1,158 @@
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from compression import COMPRESSIBLE_TYPES, choose_encoding, coded_etag, etag_matches
+from images import ImageStore
+
+# Content-addressed names only: <sha256>.<ext>, which also rules out path traversal
+MEDIA_NAME_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+# Names change whenever content changes, so caches may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+mimetypes.add_type("image/avif", ".avif")
+mimetypes.add_type("image/webp", ".webp")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single bytes range; None means serve the whole file
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        # Malformed or multiple ranges are allowed to be answered with the full body
+        return None
+    first, last = match.groups()
+    if first == "":
+        if last == "":
+            return None
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+class MediaFileResponse(Response):
+    """Response for a stored file, optionally a byte range of it
+
+    Uses the http.response.pathsend extension (zero-copy in servers that offer
+    it) for whole files, and otherwise streams CHUNK_SIZE reads from a thread.
+    """
+
+    def __init__(self, path: Path, status_code: int, headers: dict,
+                 start: int = 0, end: Optional[int] = None, send_body: bool = True):
+        self.path = path
+        self.status_code = status_code
+        self.file_headers = headers
+        self.start = start
+        self.end = end
+        self.send_body = send_body
+        self.background = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self._send_file(scope, send)
+        if self.background is not None:
+            await self.background()
+
+    async def _send_file(self, scope: Scope, send: Send):
+        size = os.stat(self.path).st_size
+        end = size - 1 if self.end is None else self.end
+        length = max(end - self.start + 1, 0)
+        headers = {**self.file_headers, "content-length": str(length)}
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+        })
+        if not self.send_body or length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        whole_file = self.start == 0 and length == size
+        if whole_file and "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            remaining = length
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+
+def media_response(request: Request, name: str) -> MediaFileResponse:
+    """Immutable, conditional, range-capable response for a file in the image store"""
+    if not MEDIA_NAME_RE.match(name):
+        raise HTTPException(status_code=404, detail="Not found")
+    path = ImageStore.root() / name
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Not found")
+
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    etag = '"' + name.split(".", 1)[0] + '"'
+    headers = {
+        "content-type": content_type,
+        "cache-control": IMMUTABLE_CACHE_CONTROL,
+        "etag": etag,
+        "accept-ranges": "bytes",
+    }
+    send_body = request.method != "HEAD"
+
+    # Pre-compressed siblings (<name>.br / <name>.gz) written by ImageStore.put
+    encoding = None
+    if content_type.startswith(COMPRESSIBLE_TYPES):
+        headers["vary"] = "Accept-Encoding"
+        available = tuple(
+            coding for coding, suffix in (("br", ".br"), ("gzip", ".gz"))
+            if path.with_name(name + suffix).is_file()
+        )
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""), available)
+
+    # Each coding is its own representation with its own strong validator
+    coded = coded_etag(etag, encoding)
+    if etag_matches(request.headers.get("if-none-match", ""), coded):
+        return MediaFileResponse(path, 304, {"cache-control": IMMUTABLE_CACHE_CONTROL, "etag": coded}, end=-1)
+
+    # Ranges are served from the identity body
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        size = path.stat().st_size
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return MediaFileResponse(
+                path, 416, {**headers, "content-range": f"bytes */{size}"}, end=-1
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            return MediaFileResponse(path, 206, headers, start, end, send_body)
+
+    if encoding:
+        headers["etag"] = coded
+        headers["content-encoding"] = encoding
+        suffix = ".br" if encoding == "br" else ".gz"
+        return MediaFileResponse(path.with_name(name + suffix), 200, headers, send_body=send_body)
+
+    return MediaFileResponse(path, 200, headers, send_body=send_body)
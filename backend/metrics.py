@@ -0,0 +1,237 @@
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo.monitoring import CommandListener
+
+# Seconds; covers cached catalog hits (sub-millisecond) up to slow bulk requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Gauge:
+    """Current value per label set, set directly or read from a callback at render time"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.callback = callback
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) - amount
+
+    def render(self) -> List[str]:
+        values = self.callback() if self.callback is not None else self._values
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Bucketed observations per label set
+
+    observe() is a bisect plus three additions; cumulative bucket counts are
+    only computed when rendering.
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        for values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                labels = _format_labels(self.labels, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REGISTRY: List[object] = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def render(metrics: Optional[Iterable[object]] = None) -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in REGISTRY if metrics is None else metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_DURATION = register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+))
+HTTP_RESPONSES = register(Counter(
+    "http_responses_total", "HTTP responses by route template and status", ("method", "route", "status")
+))
+HTTP_IN_FLIGHT = register(Gauge("http_requests_in_flight", "HTTP requests being handled"))
+DB_OPERATION_DURATION = register(Histogram(
+    "db_operation_duration_seconds", "Database method latency, including retries and Python work", ("operation",)
+))
+DB_OPERATION_ERRORS = register(Counter("db_operation_errors_total", "Database methods that raised", ("operation",)))
+MONGO_COMMAND_DURATION = register(Histogram(
+    "mongo_command_duration_seconds", "Server round trip per Mongo command", ("command", "collection")
+))
+MONGO_DOCUMENTS = register(Counter(
+    "mongo_documents_total", "Documents returned or written per Mongo command", ("command", "collection")
+))
+MONGO_COMMAND_FAILURES = register(Counter(
+    "mongo_command_failures_total", "Failed Mongo commands", ("command", "collection")
+))
+
+
+class TimingMiddleware:
+    """Latency, status and in-flight metrics per route template (/api/products/{product_id})"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Set by the router once matched; raw paths would explode label cardinality
+            route = getattr(scope.get("route"), "path_format", None) or "<unmatched>"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, scope["method"], route)
+            HTTP_RESPONSES.inc(scope["method"], route, str(status))
+
+
+def _reply_documents(command: str, reply: dict) -> int:
+    if "cursor" in reply:
+        cursor = reply["cursor"]
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if command in ("insert", "delete"):
+        return reply.get("n", 0)
+    if command == "update":
+        return reply.get("nModified", 0) + len(reply.get("upserted", ()))
+    if command == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    return 0
+
+
+class CommandMetrics(CommandListener):
+    """Mongo command latency and document counts, from the driver's monitoring events"""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[int, int], str] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self._collections[(event.request_id, event.operation_id)] = (
+            collection if isinstance(collection, str) else ""
+        )
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.request_id, event.operation_id), "")
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, collection)
+        documents = _reply_documents(event.command_name, event.reply)
+        if documents:
+            MONGO_DOCUMENTS.inc(event.command_name, collection, amount=documents)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.request_id, event.operation_id), "")
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, collection)
+        MONGO_COMMAND_FAILURES.inc(event.command_name, collection)
+
+
+def _timed(func, operation: str):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except BaseException:
+            DB_OPERATION_ERRORS.inc(operation)
+            raise
+        finally:
+            DB_OPERATION_DURATION.observe(time.perf_counter() - started, operation)
+    return wrapper
+
+
+def instrument(cls):
+    """Class decorator: time every public coroutine static/class method as db_operation_duration_seconds"""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("_") or not isinstance(attr, (staticmethod, classmethod)):
+            continue
+        if inspect.iscoroutinefunction(attr.__func__):
+            setattr(cls, name, type(attr)(_timed(attr.__func__, name)))
+    return cls
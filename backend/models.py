@@ -1,8 +1,23 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 import uuid
 
+# Image Models - derivatives generated by the image pipeline
+class ImageVariant(BaseModel):
+    url: str
+    width: int
+    height: int
+    format: str  # "avif", "webp" or "jpeg"
+    bytes: int
+
+class ImageInfo(BaseModel):
+    width: int  # Source dimensions, for aspect-ratio boxes
+    height: int
+    placeholder: Optional[str] = None  # Tiny blurred WebP as a data URI
+    variants: List[ImageVariant] = []
+    srcset: Dict[str, str] = {}  # format -> srcset string
+
 # Product Models
 class Product(BaseModel):
     id: int
@@ -27,6 +42,7 @@ class ProductResponse(BaseModel):
     image: Optional[str] = None
     price: Optional[str] = None
     featured: bool
+    image_info: Optional[ImageInfo] = None  # Responsive variants of image, when generated
 
 # Testimonial Models - Updated for image-based reviews
 class Testimonial(BaseModel):
@@ -41,7 +57,7 @@ class Testimonial(BaseModel):
 
 class TestimonialCreate(BaseModel):
     name: str
-    rating: int
+    rating: int = Field(ge=1, le=5)
     review: Optional[str] = ""
     initials: Optional[str] = ""
     review_image: Optional[str] = None
@@ -54,6 +70,7 @@ class TestimonialResponse(BaseModel):
     review: Optional[str] = ""
     initials: Optional[str] = ""
     review_image: Optional[str] = None
+    review_image_info: Optional[ImageInfo] = None  # Responsive variants of review_image, when generated
 
 # Analytics Models
 class TelegramClick(BaseModel):
@@ -61,11 +78,31 @@ class TelegramClick(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     user_agent: Optional[str] = None
     referrer: Optional[str] = None
+    device_class: Optional[str] = None  # mobile/tablet/desktop/bot/unknown, set at ingestion
+    os_family: Optional[str] = None  # ios/android/windows/macos/..., set at ingestion
+    source: Optional[str] = None  # tiktok/instagram/direct/..., normalized from referrer at ingestion
+    visitor: Optional[str] = None  # keyed hash of client address + user agent, never the raw values
 
 class TelegramClickCreate(BaseModel):
     user_agent: Optional[str] = None
     referrer: Optional[str] = None
 
+class PageView(BaseModel):
+    event: str = "page_view"
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    path: Optional[str] = None
+    user_agent: Optional[str] = None
+    referrer: Optional[str] = None
+    device_class: Optional[str] = None
+    os_family: Optional[str] = None
+    source: Optional[str] = None
+    visitor: Optional[str] = None
+
+class PageViewCreate(BaseModel):
+    path: Optional[str] = None
+    user_agent: Optional[str] = None
+    referrer: Optional[str] = None
+
 class AnalyticsResponse(BaseModel):
     success: bool
     message: str
\ No newline at end of file
@@ -0,0 +1,27 @@
+import base64
+import json
+from typing import Any, Dict, List, Sequence
+
+
+def encode_cursor(doc: Dict[str, Any], keys: Sequence[str]) -> str:
+    """Opaque cursor token holding the sort-key values of the last document on a page"""
+    raw = json.dumps([doc[key] for key in keys], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, types: Sequence[type]) -> List[Any]:
+    """Sort-key values from a cursor token; raises ValueError if it is malformed
+
+    types is the exact type of each sort key, so a token can never carry
+    query operators (dicts) or a bool where an int belongs.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+    if any(type(value) is not expected for value, expected in zip(values, types)):
+        raise ValueError("Invalid cursor")
+    return values
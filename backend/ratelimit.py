@@ -0,0 +1,192 @@
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import anyio
+from starlette.requests import Request
+
+from visitors import client_ip
+
+logger = logging.getLogger(__name__)
+
+
+class RateRule(NamedTuple):
+    """Token bucket for one route: rate tokens per second, up to burst"""
+    method: str
+    path: str
+    rate: float
+    burst: int
+
+
+# Routes that turn every request into Mongo writes
+DEFAULT_RULES = (
+    RateRule("POST", "/api/telegram-click", rate=1.0, burst=10),
+    RateRule("POST", "/api/page-view", rate=1.0, burst=10),
+    RateRule("POST", "/api/products", rate=0.2, burst=5),
+    RateRule("POST", "/api/testimonials", rate=0.2, burst=5),
+)
+
+
+class MemoryBucketStore:
+    """Token buckets for one process, as key -> (tokens, updated_at, full_at)
+
+    The dict is kept in last-used order, so idle buckets are swept from the
+    front once full_at has passed: a bucket that has refilled completely is
+    the same as no bucket. max_keys bounds memory under address-spraying.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: Dict[Tuple[str, str], Tuple[float, float, float]] = {}
+
+    async def take(self, key: Tuple[str, str], rate: float, burst: int, now: float) -> float:
+        """Take a token; 0 if allowed, else seconds until one is available"""
+        buckets = self._buckets
+        state = buckets.pop(key, None)
+        if state is None:
+            tokens = float(burst)
+        else:
+            tokens = min(float(burst), state[0] + (now - state[1]) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        self._sweep(now)
+        return wait
+
+    def _sweep(self, now: float):
+        buckets = self._buckets
+        while buckets:
+            oldest = next(iter(buckets))
+            if len(buckets) <= self.max_keys and buckets[oldest][2] > now:
+                break
+            del buckets[oldest]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Token buckets in a local SQLite file, shared by every worker on the host
+
+    Each take is one short write transaction, run in a worker thread (one
+    connection per thread) so file I/O and lock waits stay off the event
+    loop; if the file stays locked past timeout the request is let through.
+    """
+
+    def __init__(self, path: str, timeout: float = 0.05):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated_at REAL)"
+        )
+        self._takes = 0
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA synchronous=OFF")
+            self._local.db = db
+        return db
+
+    async def take(self, key: Tuple[str, str], rate: float, burst: int, now: float) -> float:
+        """Take a token; 0 if allowed, else seconds until one is available"""
+        return await anyio.to_thread.run_sync(self._take, key, rate, burst, now)
+
+    def _take(self, key: Tuple[str, str], rate: float, burst: int, now: float) -> float:
+        name = "|".join(key)
+        db = self._db
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT tokens, updated_at FROM buckets WHERE key = ?", (name,)
+                ).fetchone()
+                tokens = float(burst) if row is None else min(float(burst), row[0] + (now - row[1]) * rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+                db.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (name, tokens, now)
+                )
+                self._takes += 1
+                if self._takes % 1000 == 0:
+                    # Fully refilled buckets carry no state
+                    db.execute("DELETE FROM buckets WHERE updated_at < ?", (now - burst / rate,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Rate limit store unavailable, allowing request: {e}")
+            return 0.0
+        return wait
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+def store_from_env():
+    """RATE_LIMIT_STORE: "memory" (default, per worker) or "sqlite:<path>" (shared on the host)"""
+    spec = os.environ.get('RATE_LIMIT_STORE', 'memory')
+    if spec.startswith("sqlite:"):
+        return SQLiteBucketStore(spec[len("sqlite:"):])
+    return MemoryBucketStore(int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000)))
+
+
+class RateLimitMiddleware:
+    """Per-client, per-route token buckets; over-limit requests get 429 with Retry-After
+
+    Clients are identified by address (visitors.client_ip: X-Forwarded-For
+    only counts when a trusted proxy set it). Requests to routes without a
+    rule pass straight through.
+    """
+    limited = 0
+
+    def __init__(self, app, rules=DEFAULT_RULES, store=None, enabled: Optional[bool] = None):
+        self.app = app
+        self.rules = {(rule.method, rule.path): rule for rule in rules}
+        self.store = store if store is not None else store_from_env()
+        if enabled is None:
+            enabled = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self.rules.get((scope["method"], scope["path"].rstrip("/") or "/"))
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = (rule.path, client_ip(Request(scope)))
+        # Wall clock, so buckets in a shared store mean the same in every worker
+        wait = await self.store.take(key, rule.rate, rule.burst, time.time())
+        if wait <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        RateLimitMiddleware.limited += 1
+        body = json.dumps({"detail": "Too many requests"}).encode("utf-8")
+        headers: List[Tuple[bytes, bytes]] = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(math.ceil(wait)).encode("latin-1")),
+        ]
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
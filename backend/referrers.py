@@ -0,0 +1,44 @@
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+# Host suffix -> source; the first match wins
+SOURCE_HOSTS = (
+    ("tiktok.com", "tiktok"),
+    ("tiktokv.com", "tiktok"),
+    ("instagram.com", "instagram"),
+    ("facebook.com", "facebook"),
+    ("fb.com", "facebook"),
+    ("t.co", "twitter"),
+    ("twitter.com", "twitter"),
+    ("x.com", "twitter"),
+    ("youtube.com", "youtube"),
+    ("youtu.be", "youtube"),
+    ("t.me", "telegram"),
+    ("telegram.org", "telegram"),
+    ("whatsapp.com", "whatsapp"),
+    ("wa.me", "whatsapp"),
+    ("google.", "search"),
+    ("bing.com", "search"),
+    ("duckduckgo.com", "search"),
+)
+
+SOURCES = tuple(sorted({source for _, source in SOURCE_HOSTS})) + ("direct", "internal", "other")
+
+
+@lru_cache(maxsize=4096)
+def referrer_source(referrer: str, own_host: str = "") -> str:
+    """Normalize a referrer URL into a traffic source (tiktok, instagram, direct, ...)"""
+    if not referrer:
+        return "direct"
+    host = (urlsplit(referrer if "//" in referrer else "//" + referrer).hostname or "").lower()
+    if not host:
+        return "other"
+    if own_host and (host == own_host or host.endswith("." + own_host)):
+        return "internal"
+    for suffix, source in SOURCE_HOSTS:
+        if suffix.endswith("."):
+            if host.startswith(suffix) or ("." + suffix) in host:
+                return source
+        elif host == suffix or host.endswith("." + suffix):
+            return source
+    return "other"
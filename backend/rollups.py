@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReplaceOne
+
+from database import Database, IndexManager
+from referrers import referrer_source
+from useragent import classify
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+# Rollup dimensions stored on every bucket document
+DIMENSIONS = ("device_class", "os_family", "source")
+WATERMARK_ID = "_watermark"
+
+
+def floor_hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class AnalyticsRollup:
+    """Compacts raw telegram clicks into hourly and daily buckets in analytics_rollups
+
+    Buckets are keyed by granularity, start time and (device_class, os_family,
+    source). Only whole hours older than ROLLUP_LAG_S are rolled up, up to the
+    watermark, and every bucket is written with replace semantics. Re-running
+    a window, or running on two workers at once, gives the same result. Raw
+    events are expired here too (see expire), never ahead of the watermark.
+    """
+    _task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _bucket_id(granularity: str, bucket: datetime, dims: Tuple[str, ...]) -> str:
+        stamp = f"{bucket:%Y-%m-%dT%H}" if granularity == "hour" else f"{bucket:%Y-%m-%d}"
+        return "|".join((granularity, stamp, *dims))
+
+    @staticmethod
+    async def watermark() -> Optional[datetime]:
+        """Start of the first hour not yet rolled up"""
+        collections = Database.get_collections()
+        state = await collections['analytics_rollups'].find_one({"_id": WATERMARK_ID})
+        return state["at"] if state else None
+
+    @staticmethod
+    async def _hour_counts(start: datetime, end: datetime) -> Counter:
+        """(hour, device_class, os_family, source) -> clicks for raw events in [start, end)"""
+        collections = Database.get_collections()
+        pipeline = [
+            {"$match": {"event": "telegram_click", "timestamp": {"$gte": start, "$lt": end}}},
+            {"$group": {
+                "_id": {
+                    "hour": {"$dateToString": {"format": "%Y-%m-%dT%H", "date": "$timestamp"}},
+                    "device_class": "$device_class",
+                    "os_family": "$os_family",
+                    "source": "$source",
+                    # Only needed for events stored before classification existed
+                    "user_agent": {"$cond": [{"$ifNull": ["$device_class", False]}, None, "$user_agent"]},
+                    "referrer": {"$cond": [{"$ifNull": ["$source", False]}, None, "$referrer"]},
+                },
+                "count": {"$sum": 1},
+            }},
+        ]
+        counts = Counter()
+        async for row in collections['analytics'].aggregate(pipeline, allowDiskUse=True):
+            key = row["_id"]
+            device_class, os_family = key.get("device_class"), key.get("os_family")
+            if not device_class or not os_family:
+                device_class, os_family = classify(key.get("user_agent") or "")
+            source = key.get("source") or referrer_source(key.get("referrer") or "")
+            hour = datetime.strptime(key["hour"], "%Y-%m-%dT%H")
+            counts[(hour, device_class, os_family, source)] += row["count"]
+        return counts
+
+    @classmethod
+    async def _write_days(cls, days: List[datetime]):
+        """Recompute daily buckets for the given days from their hourly buckets"""
+        collections = Database.get_collections()
+        for day in days:
+            totals = Counter()
+            cursor = collections['analytics_rollups'].find(
+                {"granularity": "hour", "bucket": {"$gte": day, "$lt": day + timedelta(days=1)}},
+                {"count": 1, **{dim: 1 for dim in DIMENSIONS}}
+            )
+            async for doc in cursor:
+                totals[tuple(doc[dim] for dim in DIMENSIONS)] += doc["count"]
+            operations = [
+                ReplaceOne({"_id": cls._bucket_id("day", day, dims)}, {
+                    "_id": cls._bucket_id("day", day, dims),
+                    "granularity": "day",
+                    "bucket": day,
+                    **dict(zip(DIMENSIONS, dims)),
+                    "count": n,
+                }, upsert=True)
+                for dims, n in totals.items()
+            ]
+            if operations:
+                await collections['analytics_rollups'].bulk_write(operations, ordered=False)
+
+    @classmethod
+    async def run_once(cls, max_hours: int = 168) -> Dict[str, Any]:
+        """Roll up every whole hour between the watermark and now minus the lag"""
+        collections = Database.get_collections()
+        lag = timedelta(seconds=int(os.environ.get('ROLLUP_LAG_S', 300)))
+        cutoff = floor_hour(datetime.utcnow() - lag)
+
+        start = await cls.watermark()
+        if start is None:
+            oldest = await collections['analytics'].find_one(
+                {"event": "telegram_click"}, {"timestamp": 1}, sort=[("event", 1), ("timestamp", 1)]
+            )
+            if oldest is None:
+                return {"hours": 0, "buckets": 0, "watermark": None}
+            start = floor_hour(oldest["timestamp"])
+        end = min(cutoff, start + max_hours * HOUR)
+        if end <= start:
+            return {"hours": 0, "buckets": 0, "watermark": start}
+
+        counts = await cls._hour_counts(start, end)
+        operations = []
+        for (hour, *dims), n in counts.items():
+            bucket_id = cls._bucket_id("hour", hour, tuple(dims))
+            operations.append(ReplaceOne({"_id": bucket_id}, {
+                "_id": bucket_id,
+                "granularity": "hour",
+                "bucket": hour,
+                **dict(zip(DIMENSIONS, dims)),
+                "count": n,
+            }, upsert=True))
+        if operations:
+            await collections['analytics_rollups'].bulk_write(operations, ordered=False)
+
+        days = sorted({hour.replace(hour=0) for hour, *_ in counts})
+        await cls._write_days(days)
+        # Advanced last, so a crash before this point just repeats the window
+        await collections['analytics_rollups'].update_one(
+            {"_id": WATERMARK_ID}, {"$set": {"granularity": "state", "at": end}}, upsert=True
+        )
+        hours = int((end - start) / HOUR)
+        logger.info(f"Rolled up {hours}h of clicks into {len(operations)} hourly buckets")
+        return {"hours": hours, "buckets": len(operations), "watermark": end}
+
+    @classmethod
+    async def expire(cls) -> int:
+        """Delete raw events older than ANALYTICS_TTL_DAYS, clicks only once rolled up
+
+        Clicks behind the watermark live on in the rollups; clicks after it are
+        kept however old, so a first deploy over old history or a long rollup
+        outage never loses hours. Returns the number of events deleted.
+        """
+        ttl_days = IndexManager.analytics_ttl_days()
+        if ttl_days <= 0:
+            return 0
+        collections = Database.get_collections()
+        cutoff = datetime.utcnow() - timedelta(days=ttl_days)
+        watermark = await cls.watermark()
+        deleted = 0
+        if watermark is not None:
+            result = await collections['analytics'].delete_many(
+                {"event": "telegram_click", "timestamp": {"$lt": min(watermark, cutoff)}}
+            )
+            deleted += result.deleted_count
+        # Page views are not rolled up, so they expire by age alone
+        result = await collections['analytics'].delete_many(
+            {"event": {"$ne": "telegram_click"}, "timestamp": {"$lt": cutoff}}
+        )
+        deleted += result.deleted_count
+        if deleted:
+            logger.info(f"Expired {deleted} raw analytics events")
+        return deleted
+
+    @classmethod
+    async def _run(cls, interval: float):
+        while True:
+            try:
+                # Catch up in chunks after downtime, then wait for the next hour
+                while (await cls.run_once())["hours"]:
+                    pass
+                await cls.expire()
+            except Exception as e:
+                logger.error(f"Error rolling up analytics: {e}")
+            await asyncio.sleep(interval)
+
+    @classmethod
+    def start(cls):
+        """Run the rollup every ROLLUP_INTERVAL_S seconds in the background"""
+        if cls._task is None or cls._task.done():
+            interval = float(os.environ.get('ROLLUP_INTERVAL_S', 300))
+            cls._task = asyncio.get_running_loop().create_task(cls._run(interval))
+
+    @classmethod
+    async def stop(cls):
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+
+    @staticmethod
+    async def series(granularity: str, start: datetime, end: datetime, by: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Clicks per bucket in [start, end), optionally split by one dimension"""
+        collections = Database.get_collections()
+        group_id: Dict[str, Any] = {"bucket": "$bucket"}
+        if by:
+            group_id[by] = f"${by}"
+        pipeline = [
+            {"$match": {"granularity": granularity, "bucket": {"$gte": start, "$lt": end}}},
+            {"$group": {"_id": group_id, "count": {"$sum": "$count"}}},
+            {"$sort": {"_id.bucket": 1}},
+        ]
+        rows = []
+        async for row in collections['analytics_rollups'].aggregate(pipeline):
+            rows.append({**row["_id"], "count": row["count"]})
+        return rows
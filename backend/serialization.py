@@ -0,0 +1,54 @@
+import json
+import os
+from typing import Any, Dict, Type
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # stdlib json only
+    orjson = None
+
+# JSON_ENCODER=json forces the stdlib encoder, e.g. to benchmark both paths
+ENCODER = "orjson" if orjson is not None and os.environ.get('JSON_ENCODER', 'orjson') != 'json' else "json"
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON for plain data (dicts, lists, str, numbers, bool, None)"""
+    if ENCODER == "orjson":
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps(); the app's default response class"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class DocumentShape:
+    """Maps Mongo documents straight to response dicts, without building models
+
+    Keys follow the response model's field order, and fields missing from a
+    document get the stored model's default. fields lists what to project
+    from Mongo, so _id, created_at and other stored-only fields never leave
+    the database; response fields not stored (image_info) are passed in.
+    """
+
+    def __init__(self, response_model: Type[BaseModel], stored_model: Type[BaseModel]):
+        self.keys = tuple(response_model.model_fields)
+        stored = stored_model.model_fields
+        self.fields = tuple(key for key in self.keys if key in stored)
+        self.defaults: Dict[str, Any] = {
+            key: None if stored[key].is_required() else stored[key].get_default(call_default_factory=True)
+            for key in self.fields
+        }
+
+    def __call__(self, doc: Dict[str, Any], **computed: Any) -> Dict[str, Any]:
+        defaults = self.defaults
+        return {
+            key: computed[key] if key in computed else doc.get(key, defaults.get(key))
+            for key in self.keys
+        }
@@ -0,0 +1,57 @@
+"""Multi-worker launcher: python serve.py [--workers N] [--host H] [--port P]
+
+Each worker is a separate process with its own Mongo pool and caches.
+Seeding is an idempotent bulk upsert that any worker may run, and catalog
+cache invalidation reaches every worker through shared version stamps
+(see CatalogCache).
+Gunicorn works the same way:
+gunicorn server:app -k uvicorn.workers.UvicornWorker -w N
+"""
+import argparse
+import os
+import secrets
+from pathlib import Path
+
+import uvicorn
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+
+
+def prepare_environment(workers: int):
+    """Settings every worker must agree on, fixed before the workers start"""
+    load_dotenv(ROOT_DIR / '.env')
+    if not os.environ.get('VISITOR_HASH_SECRET'):
+        # Per-process keys would give one visitor a different hash in each worker
+        os.environ['VISITOR_HASH_SECRET'] = secrets.token_hex(32)
+        print("VISITOR_HASH_SECRET not set, generated one for this run")
+    if workers > 1 and 'RATE_LIMIT_STORE' not in os.environ:
+        # Share token buckets so limits hold across workers, not per worker
+        os.environ['RATE_LIMIT_STORE'] = f"sqlite:{ROOT_DIR / '.ratelimit.db'}"
+    # MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE apply per worker
+    pool = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+    print(f"Starting {workers} workers, up to {workers * pool} Mongo connections in total")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Thunder Services API with several workers")
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', 8001)))
+    args = parser.parse_args()
+
+    prepare_environment(args.workers)
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=str(ROOT_DIR),
+        # client_ip() reads X-Forwarded-For itself, only from TRUSTED_PROXIES
+        proxy_headers=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
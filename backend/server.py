@@ -1,29 +1,59 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request
+import time
+# Startup time is measured from here, so it includes the imports below
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, BackgroundTasks, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
+import json
+import asyncio
 import logging
 from pathlib import Path
-from typing import List
-from datetime import datetime
+from urllib.parse import urlsplit
+from typing import List, Optional
+from datetime import datetime, timedelta
 
 # Import models and database
 from models import (
     Product, ProductResponse, ProductCreate,
     Testimonial, TestimonialResponse, TestimonialCreate,
-    TelegramClick, TelegramClickCreate, AnalyticsResponse
+    TelegramClick, TelegramClickCreate, PageView, PageViewCreate, AnalyticsResponse
 )
-from database import Database
+from database import Database, IndexManager, PRODUCT_SORT_KEYS, PRODUCT_SORT_TYPES
+from cache import CatalogCache, CatalogPayload
+from ingestion import ClickIngestor
+from counters import ClickCounters
+from rollups import AnalyticsRollup, DIMENSIONS
+from useragent import classify
+from referrers import referrer_source
+from visitors import VisitorSketches, client_ip, visitor_id
+from pagination import encode_cursor, decode_cursor
+from images import ImagePipeline
+from uploads import receive_image
+from compression import CompressionMiddleware, choose_encoding, etag_matches
+from ratelimit import RateLimitMiddleware, store_from_env
+import metrics
+from serialization import FastJSONResponse, dumps
+from media import media_response
+from bulk import BULK_KINDS, iter_lines, iter_ndjson, iter_csv, import_records, export_records
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Create the main app without a prefix
-app = FastAPI(title="Thunder Services API", version="1.0.0")
+# orjson-rendered responses when orjson is installed (see serialization.py)
+app = FastAPI(title="Thunder Services API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Per-client token buckets for the routes that write to Mongo; added before
+# CORS so that 429 responses still carry CORS headers
+rate_limit_store = store_from_env()
+app.add_middleware(RateLimitMiddleware, store=rate_limit_store)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -33,25 +63,154 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for JSON and text responses above the threshold
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+# Outermost, so latency includes compression and rate limiting
+app.add_middleware(metrics.TimingMiddleware)
+
+# Process state read when /metrics is scraped
+metrics.register(metrics.Gauge(
+    "mongo_pool_connections", "Mongo connection pool usage in this worker", ("state",),
+    callback=lambda: {
+        (state,): Database.pool_stats().get(state, 0) for state in ("open", "checked_out", "waiting")
+    }
+))
+metrics.register(metrics.Gauge(
+    "analytics_queue_depth", "Analytics events buffered for insert",
+    callback=lambda: {(): ClickIngestor.stats()["queued"]}
+))
+metrics.register(metrics.Gauge(
+    "catalog_cache_hit_ratio", "Catalog cache hits over lookups in this worker",
+    callback=lambda: {(): CatalogCache.stats()["hit_ratio"]}
+))
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition for this worker"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# Catalog responses may be reused briefly, then revalidated with If-None-Match
+CATALOG_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+
+async def catalog_response(request: Request, payload: CatalogPayload, media_type: str = "application/json") -> Response:
+    """Serve pre-rendered catalog bytes, or 304 when the client copy is current"""
+    encoding = None
+    if len(payload.body) >= COMPRESS_MIN_BYTES:
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    # Each coding is its own representation with its own strong validator
+    headers = {"ETag": payload.etag_for(encoding), "Cache-Control": CATALOG_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    body = payload.body
+    if encoding:
+        # Compressed once per catalog version, not per request
+        body = await payload.encoded(encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
 # Health check endpoint
 @api_router.get("/")
 async def root():
     return {"message": "Thunder Services API is running", "status": "healthy"}
 
+# Image store: content-hash names, immutable caching, Range and pre-compressed variants
+@api_router.api_route("/media/{name}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_media(request: Request, name: str):
+    """Serve a file from the content-addressed image store"""
+    return media_response(request, name)
+
+# Readiness endpoint: unlike the health check, reports whether Mongo can take traffic
+@api_router.get("/ready")
+async def readiness():
+    """Readiness probe with connection pool saturation"""
+    # Live ping, so readiness follows Mongo both ways after start-up
+    reachable = await Database.ping(timeout=1.0)
+    body = {"status": "ready" if reachable else "unavailable", "pool": Database.pool_stats()}
+    return JSONResponse(body, status_code=200 if reachable else 503)
+
 # Product endpoints
+PRODUCT_FIELDS = tuple(ProductResponse.model_fields)
+PRODUCT_PAGE_DEFAULT = 50
+PRODUCT_PAGE_MAX = 500
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def parse_product_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Validate a comma-separated field projection against ProductResponse"""
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown product fields: {', '.join(unknown)}")
+    return requested
+
+def project_product(doc: dict, fields: Optional[List[str]]) -> dict:
+    """Product document as a response dict in field order, limited to the requested fields"""
+    return {field: doc.get(field) for field in (fields or PRODUCT_FIELDS)}
+
 @api_router.get("/products", response_model=List[ProductResponse])
-async def get_products():
-    """Get all products with watches (featured) first - no prices needed"""
-    try:
-        products = await Database.get_all_products()
-        return [ProductResponse(
-            id=p.id,
-            name=p.name,
-            category=p.category,
-            image=p.image,  # Will be None for placeholder products
-            price=p.price,  # Will be None since prices are hidden in frontend
-            featured=p.featured
-        ) for p in products]
+async def get_products(
+    request: Request,
+    category: Optional[str] = None,
+    featured: Optional[bool] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PRODUCT_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: Optional[str] = None
+):
+    """Get all products with watches (featured) first - no prices needed
+
+    Without query parameters the full catalog is served from cache. With
+    category/featured/fields/limit/cursor a page {items, next_cursor} is
+    returned; format=ndjson (or Accept: application/x-ndjson) streams one
+    product per line instead (without image_info).
+    """
+    stream = format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    paged = any(value is not None for value in (category, featured, limit, cursor, fields))
+    field_list = parse_product_fields(fields)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, PRODUCT_SORT_TYPES)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        if stream:
+            documents = Database.find_products(category, featured, after, field_list, limit or 0)
+
+            async def lines():
+                async for doc in documents:
+                    yield dumps(project_product(doc, field_list)) + b"\n"
+
+            return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+        if paged:
+            page_size = limit or PRODUCT_PAGE_DEFAULT
+            with_images = field_list is None or "image_info" in field_list
+            query_fields = field_list + ["image"] if field_list and with_images else field_list
+            # One extra document tells us whether another page exists
+            documents = await Database.find_products(
+                category, featured, after, query_fields, page_size + 1
+            ).to_list(page_size + 1)
+            next_cursor = None
+            if len(documents) > page_size:
+                documents = documents[:page_size]
+                next_cursor = encode_cursor(documents[-1], PRODUCT_SORT_KEYS)
+            if with_images:
+                manifests = await ImagePipeline.manifests(doc.get("image") for doc in documents)
+                for doc in documents:
+                    doc["image_info"] = ImagePipeline.image_info(manifests.get(doc.get("image")))
+            return FastJSONResponse({
+                "items": [project_product(doc, field_list) for doc in documents],
+                "next_cursor": next_cursor
+            })
+
+        # Served from the in-process catalog cache; Mongo is only hit on a miss
+        payload = await CatalogCache.get_products_payload()
+        return await catalog_response(request, payload)
     except Exception as e:
         logging.error(f"Error fetching products: {e}")
         raise HTTPException(status_code=500, detail="Error fetching products")
@@ -60,9 +219,8 @@ async def get_products():
 async def create_product(product_data: ProductCreate):
     """Create a new product (admin functionality)"""
     try:
-        # Get next ID
-        existing_products = await Database.get_all_products()
-        next_id = max([p.id for p in existing_products], default=0) + 1
+        # Atomic sequence allocation; the unique index on id backs it up
+        next_id = await Database.next_id('products')
         
         product = Product(
             id=next_id,
@@ -70,6 +228,7 @@ async def create_product(product_data: ProductCreate):
         )
         
         created_product = await Database.create_product(product)
+        await CatalogCache.invalidate('products')
         return ProductResponse(
             id=created_product.id,
             name=created_product.name,
@@ -84,29 +243,33 @@ async def create_product(product_data: ProductCreate):
 
 # Testimonial endpoints
 @api_router.get("/testimonials", response_model=List[TestimonialResponse])
-async def get_testimonials():
+async def get_testimonials(request: Request):
     """Get all approved testimonials - ready for image-based reviews"""
     try:
-        testimonials = await Database.get_all_testimonials()
-        return [TestimonialResponse(
-            id=t.id,
-            name=t.name,
-            rating=t.rating,
-            review=t.review,
-            initials=t.initials,
-            review_image=t.review_image  # New field for review images
-        ) for t in testimonials]
+        payload = await CatalogCache.get_testimonials_payload()
+        return await catalog_response(request, payload)
     except Exception as e:
         logging.error(f"Error fetching testimonials: {e}")
         raise HTTPException(status_code=500, detail="Error fetching testimonials")
 
+# Prerendered landing page: first paint and the catalog in a single request. Also
+# served at the site root, for an ingress that routes an exact "/" to the backend
+@app.api_route("/", methods=["GET", "HEAD"], include_in_schema=False)
+@api_router.api_route("/landing", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_landing(request: Request):
+    """Landing page HTML with the current catalog inlined, rendered once per catalog version"""
+    try:
+        payload = await CatalogCache.get_landing_payload()
+        return await catalog_response(request, payload, media_type="text/html; charset=utf-8")
+    except Exception as e:
+        logging.error(f"Error rendering landing page: {e}")
+        raise HTTPException(status_code=500, detail="Error rendering landing page")
+
 @api_router.post("/testimonials", response_model=TestimonialResponse)
 async def create_testimonial(testimonial_data: TestimonialCreate):
     """Create a new testimonial"""
     try:
-        # Get next ID
-        existing_testimonials = await Database.get_all_testimonials()
-        next_id = max([t.id for t in existing_testimonials], default=0) + 1
+        next_id = await Database.next_id('testimonials')
         
         testimonial = Testimonial(
             id=next_id,
@@ -114,6 +277,7 @@ async def create_testimonial(testimonial_data: TestimonialCreate):
         )
         
         created_testimonial = await Database.create_testimonial(testimonial)
+        await CatalogCache.invalidate('testimonials')
         return TestimonialResponse(
             id=created_testimonial.id,
             name=created_testimonial.name,
@@ -126,6 +290,12 @@ async def create_testimonial(testimonial_data: TestimonialCreate):
         raise HTTPException(status_code=500, detail="Error creating testimonial")
 
 # Analytics endpoints
+def traffic_source(request: Request, referrer: str) -> str:
+    """Normalized source for the landing page's referrer; our own pages count as internal"""
+    page = request.headers.get("origin") or request.headers.get("referer") or ""
+    own_host = urlsplit(page).hostname or ""
+    return referrer_source(referrer or "", own_host)
+
 @api_router.post("/telegram-click", response_model=AnalyticsResponse)
 async def track_telegram_click(request: Request, click_data: TelegramClickCreate):
     """Track Telegram button click for analytics"""
@@ -134,12 +304,36 @@ async def track_telegram_click(request: Request, click_data: TelegramClickCreate
         user_agent = request.headers.get("user-agent", "")
         referrer = request.headers.get("referer", "")
         
+        user_agent = user_agent or click_data.user_agent
+        # The Referer header of this request is the landing page itself; the
+        # page's own document.referrer (in the body, "" for direct visits) is
+        # what attributes traffic
+        if click_data.referrer is not None:
+            referrer = click_data.referrer
+        # Classified once here so stats never have to scan user agent strings
+        device_class, os_family = classify(user_agent)
+        
         telegram_click = TelegramClick(
-            user_agent=user_agent or click_data.user_agent,
-            referrer=referrer or click_data.referrer
+            user_agent=user_agent,
+            referrer=referrer,
+            device_class=device_class,
+            os_family=os_family,
+            source=traffic_source(request, referrer),
+            visitor=visitor_id(client_ip(request), user_agent or "")
         )
         
-        success = await Database.track_telegram_click(telegram_click)
+        filtered = ClickIngestor.admit(telegram_click)
+        if filtered:
+            # Counted, not stored; the client has nothing to retry
+            return AnalyticsResponse(success=True, message=f"Telegram click not recorded ({filtered})")
+
+        if ClickIngestor.running():
+            # Buffered and written in batches by the ingestion queue
+            if ClickIngestor.submit(telegram_click):
+                return AnalyticsResponse(success=True, message="Telegram click tracked successfully")
+            return AnalyticsResponse(success=False, message="Telegram click dropped, ingestion queue full")
+        
+        success = await ClickIngestor.write([telegram_click]) == 1
         
         if success:
             return AnalyticsResponse(success=True, message="Telegram click tracked successfully")
@@ -150,39 +344,152 @@ async def track_telegram_click(request: Request, click_data: TelegramClickCreate
         logging.error(f"Error tracking telegram click: {e}")
         return AnalyticsResponse(success=False, message="Error tracking telegram click")
 
+@api_router.post("/page-view", response_model=AnalyticsResponse)
+async def track_page_view(request: Request):
+    """Page-view beacon, the first step of the landing -> Telegram funnel
+
+    navigator.sendBeacon posts JSON as text/plain, so the body is parsed here
+    regardless of content type.
+    """
+    try:
+        try:
+            view_data = PageViewCreate(**json.loads(await request.body() or b"{}"))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid page view")
+        user_agent = request.headers.get("user-agent", "") or view_data.user_agent
+        device_class, os_family = classify(user_agent)
+        page_view = PageView(
+            path=view_data.path,
+            user_agent=user_agent,
+            referrer=view_data.referrer,
+            device_class=device_class,
+            os_family=os_family,
+            source=traffic_source(request, view_data.referrer),
+            visitor=visitor_id(client_ip(request), user_agent or "")
+        )
+        filtered = ClickIngestor.admit(page_view)
+        if filtered:
+            return AnalyticsResponse(success=True, message=f"Page view not recorded ({filtered})")
+        if ClickIngestor.running():
+            if ClickIngestor.submit(page_view):
+                return AnalyticsResponse(success=True, message="Page view tracked successfully")
+            return AnalyticsResponse(success=False, message="Page view dropped, ingestion queue full")
+        if await ClickIngestor.write([page_view]) == 1:
+            return AnalyticsResponse(success=True, message="Page view tracked successfully")
+        return AnalyticsResponse(success=False, message="Failed to track page view")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error tracking page view: {e}")
+        return AnalyticsResponse(success=False, message="Error tracking page view")
+
 @api_router.get("/analytics/telegram-clicks")
 async def get_telegram_clicks_count():
     """Get total telegram clicks count"""
     try:
-        count = await Database.get_telegram_clicks_count()
+        # Pre-aggregated counter, O(1) regardless of analytics history
+        count = await ClickCounters.total()
         return {"total_clicks": count}
     except Exception as e:
         logging.error(f"Error getting telegram clicks count: {e}")
         raise HTTPException(status_code=500, detail="Error getting analytics data")
 
 # New endpoints for image management
+async def process_uploaded_image(image_url: str, cache_key: str):
+    """Build derivatives for a new upload, then refresh the cached catalog"""
+    try:
+        await ImagePipeline.process(image_url)
+        await CatalogCache.invalidate(cache_key)
+    except Exception as e:
+        logging.error(f"Error processing uploaded image {image_url}: {e}")
+
 @api_router.put("/products/{product_id}/image")
-async def update_product_image(product_id: int, image_url: str):
-    """Update product image URL"""
+async def update_product_image(product_id: int, request: Request, background_tasks: BackgroundTasks, image_url: Optional[str] = None):
+    """Upload a product image (multipart or raw body), or point it at image_url"""
+    if await Database.get_product_by_id(product_id) is None:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
     try:
-        # This would typically handle image upload and update
-        # For now, we'll just return success as images are managed separately
+        if image_url is None:
+            # Streamed to disk and hashed chunk by chunk, deduplicated by content
+            image_url = await receive_image(request)
+        if not await Database.update_product_image(product_id, image_url):
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        await CatalogCache.invalidate('products')
+        background_tasks.add_task(process_uploaded_image, image_url, 'products')
         return {"success": True, "message": f"Product {product_id} image updated", "image_url": image_url}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error updating product image: {e}")
         raise HTTPException(status_code=500, detail="Error updating product image")
 
 @api_router.put("/testimonials/{testimonial_id}/image")
-async def update_testimonial_image(testimonial_id: int, image_url: str):
-    """Update testimonial review image URL"""
+async def update_testimonial_image(testimonial_id: int, request: Request, background_tasks: BackgroundTasks, image_url: Optional[str] = None):
+    """Upload a testimonial review image (multipart or raw body), or point it at image_url"""
+    if not await Database.testimonial_exists(testimonial_id):
+        raise HTTPException(status_code=404, detail=f"Testimonial {testimonial_id} not found")
     try:
-        # This would typically handle image upload and update
-        # For now, we'll just return success as images are managed separately
+        if image_url is None:
+            image_url = await receive_image(request)
+        if not await Database.update_testimonial_image(testimonial_id, image_url):
+            raise HTTPException(status_code=404, detail=f"Testimonial {testimonial_id} not found")
+        await CatalogCache.invalidate('testimonials')
+        background_tasks.add_task(process_uploaded_image, image_url, 'testimonials')
         return {"success": True, "message": f"Testimonial {testimonial_id} image updated", "image_url": image_url}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error updating testimonial image: {e}")
         raise HTTPException(status_code=500, detail="Error updating testimonial image")
 
+# Bulk import/export endpoints
+def bulk_format(request: Request, format: Optional[str]) -> str:
+    """ndjson or csv, from the format parameter or the request content type"""
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    return fmt
+
+@api_router.post("/admin/{collection}/import")
+async def bulk_import(collection: str, request: Request, format: Optional[str] = None):
+    """Import products or testimonials from a streamed NDJSON or CSV body"""
+    if collection not in BULK_KINDS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    fmt = bulk_format(request, format)
+    try:
+        lines = iter_lines(request.stream())
+        records = iter_csv(lines) if fmt == "csv" else iter_ndjson(lines)
+        result = await import_records(collection, records)
+        await CatalogCache.invalidate(collection)
+        return {"success": result["failed"] == 0, **result}
+    except Exception as e:
+        logging.error(f"Error importing {collection}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error importing {collection}")
+
+@api_router.get("/admin/{collection}/export")
+async def bulk_export(collection: str, request: Request, format: Optional[str] = "ndjson"):
+    """Stream products or testimonials as NDJSON or CSV"""
+    if collection not in BULK_KINDS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    fmt = bulk_format(request, format)
+    media_type = "text/csv; charset=utf-8" if fmt == "csv" else NDJSON_MEDIA_TYPE
+    return StreamingResponse(
+        export_records(collection, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{fmt}"'}
+    )
+
+@api_router.post("/admin/images/process")
+async def process_images(force: bool = False):
+    """Generate resized WebP/AVIF/JPEG variants for every catalog image"""
+    try:
+        result = await ImagePipeline.process_catalog(force=force)
+        await CatalogCache.invalidate()
+        return {"success": result["failed"] == 0, **result}
+    except Exception as e:
+        logging.error(f"Error processing images: {e}")
+        raise HTTPException(status_code=500, detail="Error processing images")
+
 @api_router.post("/admin/reseed")
 async def reseed_database():
     """Clear and reseed database with updated data"""
@@ -195,6 +502,7 @@ async def reseed_database():
         
         # Reseed with updated data
         await Database.seed_all()
+        await CatalogCache.invalidate()
         
         return {"success": True, "message": "Database reseeded with updated data (no prices, Spanish content)"}
     except Exception as e:
@@ -205,35 +513,24 @@ async def reseed_database():
 async def get_conversion_stats():
     """Get detailed conversion statistics for mobile optimization"""
     try:
-        # Get analytics data
-        collections = Database.get_collections()
-        total_clicks = await Database.get_telegram_clicks_count()
+        total_clicks = await ClickCounters.total()
         
-        # Get recent clicks (last 24 hours)
-        from datetime import datetime, timedelta
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        recent_clicks = await collections['analytics'].count_documents({
-            "event": "telegram_click",
-            "timestamp": {"$gte": yesterday}
-        })
+        # Recent clicks: the last 24 hourly counters written at ingestion
+        recent_clicks = await ClickCounters.recent(24)
         
-        # Get mobile vs desktop clicks (basic heuristic)
-        mobile_clicks_cursor = collections['analytics'].find({
-            "event": "telegram_click",
-            "$or": [
-                {"user_agent": {"$regex": "Mobile", "$options": "i"}},
-                {"user_agent": {"$regex": "iPhone", "$options": "i"}},
-                {"user_agent": {"$regex": "Android", "$options": "i"}}
-            ]
-        })
-        mobile_clicks = await mobile_clicks_cursor.to_list(1000)
-        mobile_percentage = (len(mobile_clicks) / total_clicks * 100) if total_clicks > 0 else 0
+        # Device breakdown from counters maintained at ingestion (classified once per click)
+        devices = await ClickCounters.by_kind("device")
+        os_families = await ClickCounters.by_kind("os")
+        mobile_clicks = devices.get("mobile", 0)
+        mobile_percentage = (mobile_clicks / total_clicks * 100) if total_clicks > 0 else 0
         
         return {
             "total_clicks": total_clicks,
             "recent_clicks_24h": recent_clicks,
-            "mobile_clicks": len(mobile_clicks),
+            "mobile_clicks": mobile_clicks,
             "mobile_percentage": round(mobile_percentage, 1),
+            "devices": devices,
+            "os_families": os_families,
             "message_focus": "Destacamos en relojes de lujo y zapatillas",
             "target_audience": "Spanish-speaking mobile users from TikTok",
             "conversion_goal": "TikTok → Landing Page → Telegram Channel"
@@ -242,35 +539,145 @@ async def get_conversion_stats():
         logging.error(f"Error getting conversion stats: {e}")
         raise HTTPException(status_code=500, detail="Error getting conversion statistics")
 
+@api_router.get("/admin/funnel")
+async def get_funnel(days: Optional[int] = Query(None, ge=1, le=366), window: str = "all"):
+    """View -> Telegram click conversion per traffic source and hour/day/week window"""
+    if window not in Database.FUNNEL_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {', '.join(Database.FUNNEL_WINDOWS)}")
+    # Raw events expire after the TTL, so longer windows would be silently truncated
+    ttl_days = IndexManager.analytics_ttl_days()
+    if days is None:
+        days = min(30, ttl_days) if ttl_days else 30
+    elif ttl_days and days > ttl_days:
+        raise HTTPException(status_code=400, detail=f"days must be at most {ttl_days} (ANALYTICS_TTL_DAYS)")
+    try:
+        rows = await Database.get_funnel(datetime.utcnow() - timedelta(days=days), window)
+        views = sum(row["views"] for row in rows)
+        clicks = sum(row["clicks"] for row in rows)
+        return {
+            "days": days,
+            "window": window,
+            "views": views,
+            "clicks": clicks,
+            "conversion": clicks / views if views else None,
+            "rows": rows,
+        }
+    except Exception as e:
+        logging.error(f"Error getting funnel: {e}")
+        raise HTTPException(status_code=500, detail="Error getting funnel")
+
+@api_router.get("/admin/unique-visitors")
+async def get_unique_visitors(
+    granularity: str = "day",
+    days: int = Query(30, ge=1, le=3660),
+    event: str = "telegram_click",
+):
+    """Approximate unique clickers (or page viewers) per hour/day and over the whole range"""
+    if granularity not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="granularity must be hour or day")
+    if event not in ("telegram_click", "page_view"):
+        raise HTTPException(status_code=400, detail="event must be telegram_click or page_view")
+    try:
+        end = datetime.utcnow()
+        result = await VisitorSketches.unique(event, granularity, end - timedelta(days=days), end)
+        return {"event": event, "granularity": granularity, "days": days, **result}
+    except Exception as e:
+        logging.error(f"Error getting unique visitors: {e}")
+        raise HTTPException(status_code=500, detail="Error getting unique visitors")
+
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats():
+    """Get catalog cache hit/miss counters"""
+    return CatalogCache.stats()
+
+@api_router.get("/admin/rate-limit-stats")
+async def get_rate_limit_stats():
+    """Get rate limiter counters"""
+    return {"limited": RateLimitMiddleware.limited, "buckets": len(rate_limit_store)}
+
+@api_router.get("/admin/ingestion-stats")
+async def get_ingestion_stats():
+    """Get click ingestion queue counters"""
+    return {**ClickIngestor.stats(), **VisitorSketches.stats()}
+
+@api_router.get("/admin/click-counters")
+async def get_click_counters():
+    """Get pre-aggregated click counters (total and per device class)"""
+    try:
+        return await ClickCounters.summary()
+    except Exception as e:
+        logging.error(f"Error getting click counters: {e}")
+        raise HTTPException(status_code=500, detail="Error getting click counters")
+
+@api_router.post("/admin/click-counters/rebuild")
+async def rebuild_click_counters():
+    """Recompute click counters from raw analytics events"""
+    try:
+        result = await ClickCounters.rebuild()
+        return {"success": True, **result}
+    except Exception as e:
+        logging.error(f"Error rebuilding click counters: {e}")
+        raise HTTPException(status_code=500, detail="Error rebuilding click counters")
+
+@api_router.get("/admin/analytics/timeseries")
+async def get_click_timeseries(
+    granularity: str = "day",
+    days: int = Query(90, ge=1, le=3660),
+    by: Optional[str] = None,
+):
+    """Clicks per hour/day from the rollups, optionally split by device_class, os_family or source"""
+    if granularity not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="granularity must be hour or day")
+    if by is not None and by not in DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(DIMENSIONS)}")
+    try:
+        end = datetime.utcnow()
+        series = await AnalyticsRollup.series(granularity, end - timedelta(days=days), end, by)
+        return {
+            "granularity": granularity,
+            "by": by,
+            # Rollups cover everything before this instant
+            "watermark": await AnalyticsRollup.watermark(),
+            "series": series,
+        }
+    except Exception as e:
+        logging.error(f"Error getting click timeseries: {e}")
+        raise HTTPException(status_code=500, detail="Error getting click timeseries")
+
+@api_router.post("/admin/analytics/rollup")
+async def run_click_rollup():
+    """Roll up elapsed hours of raw clicks now instead of waiting for the background job"""
+    try:
+        result = await AnalyticsRollup.run_once()
+        return {"success": True, **result}
+    except Exception as e:
+        logging.error(f"Error rolling up analytics: {e}")
+        raise HTTPException(status_code=500, detail="Error rolling up analytics")
+
+@api_router.get("/admin/indexes")
+async def get_index_report():
+    """Explain every Database query and flag collection scans"""
+    try:
+        report = await IndexManager.check()
+        return {"collscans": sum(1 for entry in report if entry["collscan"]), "queries": report}
+    except Exception as e:
+        logging.error(f"Error checking indexes: {e}")
+        raise HTTPException(status_code=500, detail="Error checking indexes")
+
 @api_router.get("/admin/summary")
 async def get_admin_summary():
     """Get admin dashboard summary"""
     try:
-        products = await Database.get_all_products()
-        testimonials = await Database.get_all_testimonials()
-        clicks_count = await Database.get_telegram_clicks_count()
-        
-        # Count by category
-        watches_count = len([p for p in products if p.category == 'relojes'])
-        sneakers_count = len([p for p in products if p.category == 'zapatillas'])
-        clothing_count = len([p for p in products if p.category == 'ropa'])
-        
-        return {
-            "products": {
-                "total": len(products),
-                "watches": watches_count,
-                "sneakers": sneakers_count,
-                "clothing": clothing_count,
-                "featured": len([p for p in products if p.featured])
-            },
-            "testimonials": {
-                "total": len(testimonials),
-                "average_rating": sum(t.rating for t in testimonials) / len(testimonials) if testimonials else 0
-            },
-            "analytics": {
-                "telegram_clicks": clicks_count
-            }
-        }
+        summary, clicks_count = await asyncio.gather(Database.get_catalog_summary(), ClickCounters.total())
+        categories = summary["products"]["categories"]
+        # Fixed keys kept for existing dashboards; categories has every category
+        summary["products"].update(
+            watches=categories.get('relojes', 0),
+            sneakers=categories.get('zapatillas', 0),
+            clothing=categories.get('ropa', 0),
+        )
+        summary["analytics"] = {"telegram_clicks": clicks_count}
+        return summary
     except Exception as e:
         logging.error(f"Error getting admin summary: {e}")
         raise HTTPException(status_code=500, detail="Error getting admin summary")
@@ -285,20 +692,94 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Indexes and seed data are prepared off the startup path; SEED_ON_STARTUP=false
+# leaves seeding to `python database.py --seed`
+SEED_ON_STARTUP = os.environ.get('SEED_ON_STARTUP', 'true').lower() not in ('0', 'false', 'no')
+# Seconds from import to accepting traffic before a warning is logged
+STARTUP_BUDGET_S = float(os.environ.get('STARTUP_BUDGET_S', 1.0))
+startup_seconds = None
+database_setup: Optional[asyncio.Task] = None
+
+metrics.register(metrics.Gauge(
+    "startup_duration_seconds", "Seconds from importing the app to the end of startup in this worker",
+    callback=lambda: {} if startup_seconds is None else {(): startup_seconds}
+))
+
+async def prepare_database():
+    """Create missing indexes, then seed; both are idempotent, so every worker may run them"""
+    try:
+        await IndexManager.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error ensuring indexes: {e}")
+    if not SEED_ON_STARTUP:
+        return
+    try:
+        # Catalog responses cached before the seed landed are stale
+        if await Database.seed_all():
+            await CatalogCache.invalidate()
+        logger.info("Database initialization completed")
+    except Exception as e:
+        logger.error(f"Error seeding database: {e}")
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database and seed data on startup"""
+    """Connect to the database and start background work; indexes and seeding run in the background"""
+    global database_setup, startup_seconds
     try:
         logger.info("Starting Thunder Services API...")
-        # Seed database with initial data
-        await Database.seed_all()
-        logger.info("Database initialization completed")
+        await Database.warm_up()
+    except Exception as e:
+        logger.error(f"Error preparing database: {e}")
+    try:
+        database_setup = asyncio.create_task(prepare_database())
+    except Exception as e:
+        logger.error(f"Error starting database setup: {e}")
+    try:
+        CatalogCache.start()
+    except Exception as e:
+        logger.error(f"Error starting catalog cache sync: {e}")
+    try:
+        ClickIngestor.start()
+    except Exception as e:
+        logger.error(f"Error starting click ingestion: {e}")
+    try:
+        VisitorSketches.start()
     except Exception as e:
-        logger.error(f"Error during startup: {e}")
+        logger.error(f"Error starting visitor sketches: {e}")
+    try:
+        AnalyticsRollup.start()
+    except Exception as e:
+        logger.error(f"Error starting analytics rollup: {e}")
+    startup_seconds = time.perf_counter() - IMPORT_STARTED
+    if startup_seconds > STARTUP_BUDGET_S:
+        logger.warning(f"Startup took {startup_seconds:.3f}s, over the {STARTUP_BUDGET_S}s budget")
+    else:
+        logger.info(f"Started in {startup_seconds:.3f}s")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close database connection on shutdown"""
+    if database_setup is not None and not database_setup.done():
+        # Safe to interrupt: the next start picks up where it left off
+        database_setup.cancel()
+    try:
+        await CatalogCache.stop()
+    except Exception as e:
+        logger.error(f"Error stopping catalog cache sync: {e}")
+    try:
+        await AnalyticsRollup.stop()
+    except Exception as e:
+        logger.error(f"Error stopping analytics rollup: {e}")
+    try:
+        # Flush buffered clicks before the client goes away
+        await ClickIngestor.stop()
+    except Exception as e:
+        logger.error(f"Error draining click ingestion: {e}")
+    try:
+        # After the drain, so the last batches reach the sketches
+        await VisitorSketches.stop()
+    except Exception as e:
+        logger.error(f"Error flushing visitor sketches: {e}")
     try:
         Database.close_connection()
         logger.info("Database connection closed")
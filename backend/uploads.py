@@ -0,0 +1,149 @@
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from images import ImageStore
+
+# Leading bytes -> stored extension for the image types we accept
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+def sniff_extension(head: bytes) -> Optional[str]:
+    """File extension for an image from its first bytes, None if not a supported image"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return "avif"
+    return None
+
+
+class StreamedUpload:
+    """Writes incoming chunks to a temp file in the image store, hashing as it goes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b""
+        self.digest = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(dir=ImageStore.root(), suffix=".upload")
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Image larger than {self.max_bytes} bytes")
+        if len(self.head) < 16:
+            self.head += data[:16 - len(self.head)]
+        self.digest.update(data)
+        self.file.write(data)
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def commit(self) -> str:
+        """Move the upload to its content address and return its media URL"""
+        self.file.close()
+        if self.size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        extension = sniff_extension(self.head)
+        if extension is None:
+            raise HTTPException(status_code=415, detail="Unsupported image type")
+        name = f"{self.digest.hexdigest()}.{extension}"
+        target = ImageStore.root() / name
+        if target.exists():
+            # Same bytes already stored: deduplicated
+            os.remove(self.path)
+        else:
+            os.replace(self.path, target)
+        return ImageStore.url(name)
+
+
+async def receive_image(request: Request) -> str:
+    """Stream an image upload to the store and return its URL
+
+    Accepts multipart/form-data (the first file part, or a part named "file")
+    or a raw image body. Only one chunk is held in memory at a time.
+    """
+    max_bytes = int(os.environ.get('MAX_UPLOAD_BYTES', 20 * 1024 * 1024))
+    upload = StreamedUpload(max_bytes)
+    try:
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type == b"multipart/form-data":
+            await _receive_multipart(request, params.get(b"boundary"), upload)
+        else:
+            async for chunk in request.stream():
+                upload.write(chunk)
+        return upload.commit()
+    except BaseException:
+        upload.discard()
+        raise
+
+
+async def _receive_multipart(request: Request, boundary: Optional[bytes], upload: StreamedUpload):
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Missing multipart boundary")
+    # Header names/values may arrive split across chunks, so they are accumulated
+    state = {"header": b"", "disposition": b"", "in_file": False, "done": False}
+    found = False
+
+    def on_part_begin():
+        state["disposition"] = b""
+
+    def on_header_field(data, start, end):
+        state["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        if state["header"].lower() == b"content-disposition":
+            state["disposition"] += data[start:end]
+
+    def on_header_end():
+        state["header"] = b""
+
+    def on_headers_finished():
+        nonlocal found
+        _, options = parse_options_header(state["disposition"])
+        is_file = b"filename" in options or options.get(b"name") == b"file"
+        state["in_file"] = is_file and not state["done"]
+        found = found or state["in_file"]
+
+    def on_part_data(data, start, end):
+        if state["in_file"]:
+            upload.write(data[start:end])
+
+    def on_part_end():
+        if state["in_file"]:
+            state["done"] = True
+            state["in_file"] = False
+
+    parser = MultipartParser(boundary, callbacks={
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    async for chunk in request.stream():
+        parser.write(chunk)
+    parser.finalize()
+    if not found:
+        raise HTTPException(status_code=400, detail="No file part in upload")
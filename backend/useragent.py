@@ -0,0 +1,66 @@
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# Checked in order: bots first, then tablets (Android without "Mobile"), then phones.
+# Tokens match whole words or product names ("Googlebot/2.1", "AdsBot-Google",
+# "Slackbot 1.0"), never substrings of device models such as "CUBOT_X30"
+_BOT_RE = re.compile(
+    r"bot(?=[/\-;)]|\s*[\d(]|$)|\bbot\b|\+https?://|crawl|spider|\bslurp\b|"
+    r"uripreview|web preview|facebookexternalhit|headless|lighthouse|"
+    r"python-requests|python-urllib|aiohttp/|httpx/|curl/|\bwget/|go-http-client|okhttp/|"
+    r"\bjava/|node-fetch|axios/|postman|scrapy|phantomjs|selenium|puppeteer|playwright|"
+    r"monitor/|\buptime|pingdom|scan/|fetcher\b|archiver|bytespider|petalsearch",
+    re.IGNORECASE,
+)
+_TABLET_RE = re.compile(r"ipad|tablet|kindle|silk/|playbook|android(?!.*mobile)", re.IGNORECASE)
+_MOBILE_RE = re.compile(r"mobi|iphone|ipod|android|windows phone|blackberry|opera mini", re.IGNORECASE)
+
+# OS family patterns, first match wins (iOS before macOS: iPad UAs mention "Mac OS X")
+_OS_PATTERNS = (
+    ("ios", re.compile(r"iphone|ipad|ipod|\bios\b", re.IGNORECASE)),
+    ("android", re.compile(r"android", re.IGNORECASE)),
+    ("windows", re.compile(r"windows", re.IGNORECASE)),
+    ("chromeos", re.compile(r"\bcros\b", re.IGNORECASE)),
+    ("macos", re.compile(r"macintosh|mac os x", re.IGNORECASE)),
+    ("linux", re.compile(r"linux|x11", re.IGNORECASE)),
+)
+
+DEVICE_CLASSES = ("mobile", "tablet", "desktop", "bot", "unknown")
+OS_FAMILIES = ("ios", "android", "windows", "chromeos", "macos", "linux", "other", "unknown")
+
+
+@lru_cache(maxsize=4096)
+def classify_device(user_agent: str) -> str:
+    """Classify a user agent as mobile, tablet, desktop, bot or unknown"""
+    if not user_agent:
+        return "unknown"
+    if _BOT_RE.search(user_agent):
+        return "bot"
+    if _TABLET_RE.search(user_agent):
+        return "tablet"
+    if _MOBILE_RE.search(user_agent):
+        return "mobile"
+    return "desktop"
+
+
+@lru_cache(maxsize=4096)
+def classify_os(user_agent: str) -> str:
+    """Classify a user agent's operating system family"""
+    if not user_agent:
+        return "unknown"
+    for family, pattern in _OS_PATTERNS:
+        if pattern.search(user_agent):
+            return family
+    return "other"
+
+
+def is_bot(user_agent: str) -> bool:
+    """Crawlers, link previewers, scripts and empty user agents (browsers always send one)"""
+    return classify_device(user_agent or "") in ("bot", "unknown")
+
+
+def classify(user_agent: str) -> Tuple[str, str]:
+    """(device_class, os_family) for a user agent"""
+    user_agent = user_agent or ""
+    return classify_device(user_agent), classify_os(user_agent)
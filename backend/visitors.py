@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import math
+import os
+import secrets
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import Binary
+from fastapi import Request
+from pymongo.errors import DuplicateKeyError
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# 2^12 one-byte registers: 4 KiB per sketch (less once zlib-compressed), ~1.6% standard error
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+_RANK_BITS = 64 - HLL_PRECISION
+# 2^-rank for every possible register value, so estimates are a table lookup per register
+_INVERSE_POWERS = tuple(2.0 ** -rank for rank in range(_RANK_BITS + 2))
+
+
+# Peers whose X-Forwarded-For is believed: loopback and private networks, where the ingress runs
+DEFAULT_TRUSTED_PROXIES = "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7"
+
+
+@lru_cache(maxsize=8)
+def _proxy_networks(spec: str) -> Tuple[Any, ...]:
+    networks = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning(f"Ignoring invalid TRUSTED_PROXIES entry: {item}")
+    return tuple(networks)
+
+
+def is_trusted_proxy(address: str) -> bool:
+    """Whether address is in TRUSTED_PROXIES (comma-separated addresses/CIDRs)"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    networks = _proxy_networks(os.environ.get('TRUSTED_PROXIES', DEFAULT_TRUSTED_PROXIES))
+    return any(ip in network for network in networks)
+
+
+def client_ip(request: Request) -> str:
+    """Client address as seen by the first trusted proxy
+
+    X-Forwarded-For is only read when the peer is a trusted proxy, and then
+    from the right: each proxy appends the address it saw, so the right-most
+    hop that is not itself a trusted proxy is the client. Hops to its left
+    are whatever the client sent and are never used.
+    """
+    peer = request.client.host if request.client else ""
+    if not is_trusted_proxy(peer):
+        return peer
+    hops = [
+        hop.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for hop in header.split(",")
+        if hop.strip()
+    ]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+_secret: Optional[bytes] = None
+
+
+def _hash_secret() -> bytes:
+    global _secret
+    if _secret is None:
+        configured = os.environ.get('VISITOR_HASH_SECRET', '')
+        if configured:
+            _secret = configured.encode("utf-8")
+        else:
+            # Still privacy-safe, but visitors are only recognised until restart
+            logger.warning("VISITOR_HASH_SECRET not set, using a per-process key")
+            _secret = secrets.token_bytes(32)
+    return _secret
+
+
+def visitor_id(ip: str, user_agent: str) -> str:
+    """Keyed hash of client address and user agent; neither can be recovered from it"""
+    digest = hmac.new(_hash_secret(), f"{ip}\n{user_agent}".encode("utf-8"), hashlib.sha256)
+    return digest.hexdigest()[:32]
+
+
+class HyperLogLog:
+    """Fixed-size cardinality sketch; merging two sketches is a register-wise max"""
+    __slots__ = ('registers',)
+
+    def __init__(self, registers: Optional[bytes] = None):
+        self.registers = bytearray(registers) if registers else bytearray(HLL_REGISTERS)
+
+    def add(self, value: str):
+        h = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        index = h >> _RANK_BITS
+        rank = _RANK_BITS - (h & ((1 << _RANK_BITS) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self) -> int:
+        m = HLL_REGISTERS
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(_INVERSE_POWERS[r] for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_binary(self) -> Binary:
+        return Binary(zlib.compress(bytes(self.registers), 6))
+
+    @classmethod
+    def from_binary(cls, data: bytes) -> "HyperLogLog":
+        return cls(zlib.decompress(data))
+
+
+class VisitorSketches:
+    """Unique visitors per event type and hour/day, as HyperLogLog sketches
+
+    Events are added in memory at ingestion and merged into visitor_sketches
+    every SKETCH_FLUSH_INTERVAL_S seconds (and on shutdown). The merge uses a
+    version check, so workers flushing the same bucket never lose registers.
+    """
+    _pending: Dict[Tuple[str, str, datetime], HyperLogLog] = {}
+    _task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _bucket_start(granularity: str, ts: datetime) -> datetime:
+        if granularity == "hour":
+            return ts.replace(minute=0, second=0, microsecond=0)
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def _bucket_id(event: str, granularity: str, bucket: datetime) -> str:
+        stamp = f"{bucket:%Y-%m-%dT%H}" if granularity == "hour" else f"{bucket:%Y-%m-%d}"
+        return f"{event}|{granularity}|{stamp}"
+
+    @classmethod
+    def add(cls, events: Iterable[Any]):
+        """Add written events that carry a visitor hash"""
+        for event in events:
+            if not event.visitor:
+                continue
+            for granularity in ("hour", "day"):
+                key = (event.event, granularity, cls._bucket_start(granularity, event.timestamp))
+                sketch = cls._pending.get(key)
+                if sketch is None:
+                    sketch = cls._pending[key] = HyperLogLog()
+                sketch.add(event.visitor)
+
+    @classmethod
+    async def _merge(cls, event: str, granularity: str, bucket: datetime, sketch: HyperLogLog):
+        collections = Database.get_collections()
+        bucket_id = cls._bucket_id(event, granularity, bucket)
+        while True:
+            doc = await collections['visitor_sketches'].find_one({"_id": bucket_id})
+            if doc is None:
+                try:
+                    await collections['visitor_sketches'].insert_one({
+                        "_id": bucket_id,
+                        "event": event,
+                        "granularity": granularity,
+                        "bucket": bucket,
+                        "registers": sketch.to_binary(),
+                        "version": 1,
+                    })
+                    return
+                except DuplicateKeyError:
+                    continue
+            merged = HyperLogLog.from_binary(doc["registers"]).merge(sketch)
+            result = await collections['visitor_sketches'].update_one(
+                {"_id": bucket_id, "version": doc["version"]},
+                {"$set": {"registers": merged.to_binary()}, "$inc": {"version": 1}}
+            )
+            if result.matched_count == 1:
+                return
+
+    @classmethod
+    async def flush(cls) -> int:
+        """Persist pending sketches; returns how many buckets were written"""
+        pending, cls._pending = cls._pending, {}
+        written = 0
+        for (event, granularity, bucket), sketch in pending.items():
+            try:
+                await cls._merge(event, granularity, bucket, sketch)
+                written += 1
+            except Exception as e:
+                logger.error(f"Error persisting visitor sketch: {e}")
+                # Keep it for the next flush, merged with anything added since
+                key = (event, granularity, bucket)
+                if key in cls._pending:
+                    sketch.merge(cls._pending[key])
+                cls._pending[key] = sketch
+        return written
+
+    @classmethod
+    async def _run(cls, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await cls.flush()
+
+    @classmethod
+    def start(cls):
+        """Flush sketches every SKETCH_FLUSH_INTERVAL_S seconds in the background"""
+        if cls._task is None or cls._task.done():
+            interval = float(os.environ.get('SKETCH_FLUSH_INTERVAL_S', 10))
+            cls._task = asyncio.get_running_loop().create_task(cls._run(interval))
+
+    @classmethod
+    async def stop(cls):
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        await cls.flush()
+
+    @classmethod
+    async def unique(cls, event: str, granularity: str, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Approximate unique visitors per bucket in [start, end) and over the whole range
+
+        Sketches are streamed and folded into one accumulator, so memory does
+        not grow with the length of the range.
+        """
+        collections = Database.get_collections()
+        start = cls._bucket_start(granularity, start)
+        # Not yet flushed
+        pending = {
+            bucket: sketch for (pending_event, pending_granularity, bucket), sketch in list(cls._pending.items())
+            if pending_event == event and pending_granularity == granularity and start <= bucket < end
+        }
+        total = HyperLogLog()
+        series: List[Dict[str, Any]] = []
+
+        def fold(bucket: datetime, sketch: HyperLogLog):
+            total.merge(sketch)
+            series.append({"bucket": bucket, "unique": sketch.estimate()})
+
+        cursor = collections['visitor_sketches'].find(
+            {"event": event, "granularity": granularity, "bucket": {"$gte": start, "$lt": end}},
+            {"bucket": 1, "registers": 1}
+        )
+        async for doc in cursor:
+            sketch = HyperLogLog.from_binary(doc["registers"])
+            if doc["bucket"] in pending:
+                sketch.merge(pending.pop(doc["bucket"]))
+            fold(doc["bucket"], sketch)
+        for bucket, sketch in pending.items():
+            fold(bucket, HyperLogLog(sketch.registers))
+        series.sort(key=lambda row: row["bucket"])
+        return {"unique": total.estimate(), "series": series}
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {"pending_sketches": len(cls._pending), "precision": HLL_PRECISION}
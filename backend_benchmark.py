@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the Thunder Services API
+Runs the app in-process against mongomock-motor (or a throwaway mongod via
+--mongo-url) and reports p50/p95/p99 latency and req/s per endpoint.
+
+    python backend_benchmark.py --mix catalog --concurrency 50 --duration 20
+    python backend_benchmark.py --mix clicks --compare benchmark-results/clicks-<commit>.json
+
+Results are written as JSON (benchmark-results/<mix>-<commit>.json by
+default) so runs can be compared across commits. Absolute numbers against
+mongomock measure the Python side only; compare runs made the same way.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR / 'backend'))
+
+MOBILE_UA = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Mobile/15E148 musical_ly_34.1.0 BytedanceWebview/d8a21c6"
+)
+REFERRERS = ("https://www.tiktok.com/", "https://l.instagram.com/", "", "https://www.google.com/")
+
+# name -> (method, path, body factory); every request comes from a new client address
+_client_ids = itertools.count(1)
+
+
+def _client_headers() -> Dict[str, str]:
+    # The transport connects from loopback, a trusted proxy, so this hop is what the
+    # ingress would append for a distinct phone (distinct visitors, no dedup drops)
+    n = next(_client_ids)
+    return {"x-forwarded-for": f"100.{64 + (n >> 16 & 63)}.{n >> 8 & 255}.{n & 255}", "user-agent": MOBILE_UA}
+
+
+ENDPOINTS: Dict[str, Tuple[str, str, Optional[Callable[[], Any]]]] = {
+    "products": ("GET", "/api/products", None),
+    "products_page": ("GET", "/api/products?limit=4&fields=id,name,category", None),
+    "testimonials": ("GET", "/api/testimonials", None),
+    "landing": ("GET", "/api/landing", None),
+    "telegram_click": ("POST", "/api/telegram-click", lambda: {"referrer": random.choice(REFERRERS)}),
+    "page_view": ("POST", "/api/page-view", lambda: {"path": "/", "referrer": random.choice(REFERRERS)}),
+    "click_count": ("GET", "/api/analytics/telegram-clicks", None),
+    "conversion_stats": ("GET", "/api/admin/conversion-stats", None),
+    "summary": ("GET", "/api/admin/summary", None),
+    "funnel": ("GET", "/api/admin/funnel?window=day", None),
+    "click_counters": ("GET", "/api/admin/click-counters", None),
+}
+
+# Weights per endpoint
+MIXES: Dict[str, Dict[str, float]] = {
+    # Landing page traffic: 95% catalog reads, a few beacons, rare dashboard calls
+    "catalog": {"products": 55, "testimonials": 35, "products_page": 5, "landing": 5,
+                "page_view": 2.5, "telegram_click": 1.5, "conversion_stats": 0.5, "summary": 0.5},
+    # A campaign spike: beacon-heavy
+    "clicks": {"telegram_click": 60, "page_view": 25, "products": 10, "testimonials": 5},
+    # Dashboard refreshes while traffic is recorded
+    "admin": {"conversion_stats": 25, "summary": 25, "funnel": 20, "click_counters": 15,
+              "click_count": 5, "telegram_click": 10},
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], statuses: Dict[int, int], errors: int, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": count,
+        "errors": errors,
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "rps": round(count / elapsed, 1) if elapsed else 0,
+        "mean_ms": ms(sum(latencies) / count) if count else 0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if count else 0,
+    }
+
+
+def use_mongomock():
+    """Point Database at an in-memory mongomock-motor client before the app starts"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("mongomock-motor is required without --mongo-url: pip install mongomock-motor")
+    import database
+
+    database.Database._client = AsyncMongoMockClient()
+    database.Database._db = database.Database._client['benchmark']
+
+
+def measure_serialization(items: int = 1000, rounds: int = 5) -> Dict[str, Any]:
+    """Microseconds per product to render a catalog body, via response models and
+    jsonable_encoder (the previous path) and via DocumentShape plus dumps()"""
+    import json as stdlib_json
+    from fastapi.encoders import jsonable_encoder
+    from models import Product, ProductResponse
+    from cache import PRODUCT_SHAPE
+    from serialization import ENCODER, dumps
+
+    categories = ("relojes", "zapatillas", "ropa")
+    stored = [
+        Product(id=i, name=f"Producto {i}", category=categories[i % 3], featured=i % 4 == 0,
+                image=f"/images/{i}.jpg").dict()
+        for i in range(items)
+    ]
+    # What the Mongo projection returns
+    projected = [{field: doc[field] for field in PRODUCT_SHAPE.fields} for doc in stored]
+
+    def models_path():
+        products = [Product(**doc) for doc in stored]
+        responses = [ProductResponse(
+            id=p.id, name=p.name, category=p.category, image=p.image, price=p.price, featured=p.featured,
+            image_info=None
+        ) for p in products]
+        stdlib_json.dumps(
+            jsonable_encoder(responses), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    def documents_path():
+        dumps([PRODUCT_SHAPE(doc, image_info=None) for doc in projected])
+
+    def per_item_us(render) -> float:
+        best = float("inf")
+        for _ in range(rounds):
+            started = time.perf_counter()
+            render()
+            best = min(best, time.perf_counter() - started)
+        return round(best / items * 1e6, 3)
+
+    return {
+        "items": items,
+        "encoder": ENCODER,
+        "models_us_per_item": per_item_us(models_path),
+        "documents_us_per_item": per_item_us(documents_path),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    import httpx
+    import server
+
+    mix = MIXES[args.mix]
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    statuses: Dict[str, Dict[int, int]] = {name: {} for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+
+    await server.app.router.startup()
+    startup_ms = round(server.startup_seconds * 1000, 1)
+    print(f"startup: {startup_ms} ms (import + startup event)")
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            async def request(name: str, record: bool):
+                method, path, body = ENDPOINTS[name]
+                started = time.perf_counter()
+                try:
+                    if body is None:
+                        response = await client.request(method, path, headers=_client_headers())
+                    else:
+                        response = await client.request(method, path, json=body(), headers=_client_headers())
+                    status = response.status_code
+                except Exception:
+                    status = None
+                if not record:
+                    return
+                latencies[name].append(time.perf_counter() - started)
+                if status is None:
+                    errors[name] += 1
+                else:
+                    statuses[name][status] = statuses[name].get(status, 0) + 1
+                    if status >= 500:
+                        errors[name] += 1
+
+            async def user(deadline: float, record: bool, rng: random.Random):
+                while time.perf_counter() < deadline:
+                    await request(rng.choices(names, weights)[0], record)
+                    # mongomock never suspends, so yield as a network round trip would;
+                    # otherwise handlers that do wait (gather, queues) starve behind other users
+                    await asyncio.sleep(0)
+
+            for phase, seconds, record in (("warm-up", args.warmup, False), ("measure", args.duration, True)):
+                if seconds <= 0:
+                    continue
+                print(f"{phase}: {args.concurrency} users for {seconds}s ({args.mix} mix)")
+                started = time.perf_counter()
+                deadline = started + seconds
+                await asyncio.gather(*(
+                    user(deadline, record, random.Random(args.seed * 1000 + i)) for i in range(args.concurrency)
+                ))
+                elapsed = time.perf_counter() - started
+    finally:
+        await server.app.router.shutdown()
+
+    serialization = measure_serialization()
+    all_latencies = [value for values in latencies.values() for value in values]
+    all_statuses: Dict[int, int] = {}
+    for per_endpoint in statuses.values():
+        for status, n in per_endpoint.items():
+            all_statuses[status] = all_statuses.get(status, 0) + n
+    return {
+        "mix": args.mix,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mongo": "url" if args.mongo_url else "mongomock",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "startup_ms": startup_ms,
+        "serialization": serialization,
+        "total": summarize(all_latencies, all_statuses, sum(errors.values()), elapsed),
+        "endpoints": {
+            name: summarize(latencies[name], statuses[name], errors[name], elapsed)
+            for name in names if latencies[name]
+        },
+    }
+
+
+def print_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    serialization = result["serialization"]
+    print(f"catalog rendering per product: {serialization['models_us_per_item']} us via models, "
+          f"{serialization['documents_us_per_item']} us via documents + {serialization['encoder']}\n")
+    header = f"{'endpoint':<18}{'req':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+    if baseline:
+        header += f"{'p95 vs base':>13}{'req/s vs base':>15}"
+    print(header)
+    print("-" * len(header))
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for name, stats in rows:
+        line = (f"{name:<18}{stats['requests']:>8}{stats['rps']:>9}{stats['p50_ms']:>9}"
+                f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['errors']:>8}")
+        if baseline:
+            base = baseline["total"] if name == "TOTAL" else baseline["endpoints"].get(name)
+            if base and base["p95_ms"] and base["rps"]:
+                line += f"{(stats['p95_ms'] / base['p95_ms'] - 1) * 100:>+12.1f}%"
+                line += f"{(stats['rps'] / base['rps'] - 1) * 100:>+14.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Thunder Services API in-process")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="catalog")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before measuring")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the request sequence")
+    parser.add_argument("--json-encoder", choices=("orjson", "json"),
+                        help="response encoder (default orjson when installed)")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep the rate limiter on (off by default; the benchmark measures handlers)")
+    parser.add_argument("--mongo-url", help="use this (throwaway) MongoDB instead of mongomock-motor")
+    parser.add_argument("--output", help="JSON result path (default benchmark-results/<mix>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    # Stable visitor hashes, no generated-secret warning; quiet request logging
+    os.environ.setdefault('VISITOR_HASH_SECRET', 'benchmark')
+    if args.json_encoder:
+        os.environ['JSON_ENCODER'] = args.json_encoder
+    if not args.rate_limit:
+        os.environ['RATE_LIMIT_ENABLED'] = 'false'
+    if args.mongo_url:
+        os.environ['MONGO_URL'] = args.mongo_url
+        os.environ.setdefault('DB_NAME', 'thunder_benchmark')
+    else:
+        use_mongomock()
+    import logging
+    logging.disable(logging.WARNING)
+
+    random.seed(args.seed)
+    result = asyncio.run(run_benchmark(args))
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result, baseline)
+
+    output = Path(args.output or ROOT_DIR / "benchmark-results" / f"{args.mix}-{result['commit']}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2) + "\n")
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
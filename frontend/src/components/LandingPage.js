@@ -9,15 +9,30 @@ import axios from 'axios';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Catalog inlined by the prerendered landing page (GET /api/landing), when served from it
+const readInlineCatalog = () => {
+  const node = document.getElementById('catalog-data');
+  if (!node) return null;
+  try {
+    return JSON.parse(node.textContent);
+  } catch (err) {
+    console.error('Error reading inline catalog:', err);
+    return null;
+  }
+};
+const inlineCatalog = readInlineCatalog();
+
 const LandingPage = () => {
   const [isVisible, setIsVisible] = useState({});
-  const [products, setProducts] = useState([]);
-  const [testimonials, setTestimonials] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const [products, setProducts] = useState(inlineCatalog ? inlineCatalog.products : []);
+  const [testimonials, setTestimonials] = useState(inlineCatalog ? inlineCatalog.testimonials : []);
+  const [loading, setLoading] = useState(!inlineCatalog);
   const [error, setError] = useState(null);
 
-  // Fetch data from backend
+  // Fetch data from backend, unless the page arrived with it
   useEffect(() => {
+    if (inlineCatalog) return;
+
     const fetchData = async () => {
       try {
         setLoading(true);
@@ -43,6 +58,19 @@ const LandingPage = () => {
     fetchData();
   }, []);
 
+  // Record the page view (first step of the TikTok → Telegram funnel)
+  useEffect(() => {
+    const view = JSON.stringify({
+      path: window.location.pathname,
+      user_agent: navigator.userAgent,
+      referrer: document.referrer
+    });
+    if (!(navigator.sendBeacon && navigator.sendBeacon(`${API}/page-view`, view))) {
+      axios.post(`${API}/page-view`, view, { headers: { 'Content-Type': 'text/plain' } })
+        .catch(err => console.error('Error tracking page view:', err));
+    }
+  }, []);
+
   // Enhanced Intersection Observer for more visual animations
   useEffect(() => {
     const observer = new IntersectionObserver(
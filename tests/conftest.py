@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# Backend modules import each other as top-level modules (server.py runs from backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Database backed by a fresh in-memory mongomock-motor client"""
+    from database import Database
+
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(Database, "_client", client)
+    monkeypatch.setattr(Database, "_db", client["thunder_test"])
+    monkeypatch.setattr(Database, "_synced_sequences", set())
+    return Database
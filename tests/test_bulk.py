@@ -0,0 +1,91 @@
+import asyncio
+
+from bulk import import_records, iter_csv, iter_lines, iter_ndjson
+
+
+async def chunks_of(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def collect(iterator):
+    async def run():
+        return [item async for item in iterator]
+    return asyncio.run(run())
+
+
+def parse_csv(text: str, chunk_size: int = 7):
+    return collect(iter_csv(iter_lines(chunks_of(text.encode("utf-8"), chunk_size))))
+
+
+def test_iter_lines_across_chunk_boundaries():
+    data = "﻿id,name\n1,Señor\n2,Reloj".encode("utf-8")
+    for size in (1, 2, 3, 5, len(data)):
+        assert collect(iter_lines(chunks_of(data, size))) == ["id,name\n", "1,Señor\n", "2,Reloj"]
+
+
+def test_csv_records():
+    assert parse_csv("name, rating\nAna,5\n\nLuis,4\n") == [
+        (2, {"name": "Ana", "rating": "5"}),
+        (4, {"name": "Luis", "rating": "4"}),
+    ]
+
+
+def test_csv_multi_line_quoted_field():
+    text = 'name,review,rating\nAna,"Muy bueno,\nllegó ""rápido""\n\ny bien",5\nLuis,ok,4\n'
+    assert parse_csv(text) == [
+        (2, {"name": "Ana", "review": 'Muy bueno,\nllegó "rápido"\n\ny bien', "rating": "5"}),
+        (3, {"name": "Luis", "review": "ok", "rating": "4"}),
+    ]
+
+
+def test_csv_empty_cells_are_left_out():
+    assert parse_csv("name,image,price\nReloj,,\n") == [(2, {"name": "Reloj"})]
+
+
+def test_csv_column_count_mismatch():
+    assert parse_csv("name,rating\nAna\nLuis,4,extra\nEva,3\n") == [
+        (2, "Expected 2 columns, got 1"),
+        (3, "Expected 2 columns, got 3"),
+        (4, {"name": "Eva", "rating": "3"}),
+    ]
+
+
+def test_csv_unterminated_quote():
+    assert parse_csv('name,review\nAna,ok\nLuis,"never closed\n') == [
+        (2, {"name": "Ana", "review": "ok"}),
+        (3, "Unterminated quoted field"),
+    ]
+
+
+def test_ndjson():
+    text = '{"name": "a"}\n\nnot json\n[1]\n{"name": "b"}'
+    rows = collect(iter_ndjson(iter_lines(chunks_of(text.encode("utf-8"), 4))))
+    assert rows[0] == (1, {"name": "a"})
+    assert rows[1][0] == 3 and rows[1][1].startswith("Invalid JSON")
+    assert rows[2:] == [(4, "Expected a JSON object"), (5, {"name": "b"})]
+
+
+async def ndjson_records(*lines):
+    async def chunks():
+        yield "\n".join(lines).encode("utf-8")
+    async for item in iter_ndjson(iter_lines(chunks())):
+        yield item
+
+
+def test_import_allocates_ids_past_the_batch_ids(db):
+    async def run():
+        await db.seed_all()
+        result = await import_records("products", ndjson_records(
+            '{"id": 10, "name": "Explícito", "category": "ropa"}',
+            '{"name": "Sin id", "category": "ropa"}',
+        ))
+        products = db.get_collections()["products"]
+        ids = sorted([doc["id"] async for doc in products.find({}, {"id": 1})])
+        return result, ids, await db.next_id("products")
+
+    result, ids, next_id = asyncio.run(run())
+    assert result["failed"] == 0
+    assert (result["inserted"], result["upserted"]) == (1, 1)
+    assert ids == list(range(1, 12))
+    assert next_id == 12
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from compression import CompressionMiddleware, coded_etag, etag_matches
+
+ETAG = '"0123abcd"'
+
+
+def test_coded_etag():
+    assert coded_etag(ETAG, None) == ETAG
+    assert coded_etag(ETAG, "br") == '"0123abcd-br"'
+    assert coded_etag(ETAG, "gzip") == '"0123abcd-gz"'
+    assert len({coded_etag(ETAG, coding) for coding in (None, "br", "gzip")}) == 3
+
+
+def test_coded_etag_leaves_weak_tags():
+    assert coded_etag('W/"0123abcd"', "br") == 'W/"0123abcd"'
+
+
+@pytest.mark.parametrize("header, etag, expected", [
+    ('"0123abcd"', ETAG, True),
+    ('W/"0123abcd"', ETAG, True),
+    ('"other", "0123abcd-br"', '"0123abcd-br"', True),
+    ("*", ETAG, True),
+    ('"0123abcd"', '"0123abcd-br"', False),
+    ('"0123abcd-gz"', '"0123abcd-br"', False),
+    ("", ETAG, False),
+])
+def test_etag_matches(header, etag, expected):
+    assert etag_matches(header, etag) is expected
+
+
+def run_middleware(app, accept_encoding="br, gzip"):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=10)(scope, receive, send))
+    return sent
+
+
+def start_message(content_type=b"image/svg+xml"):
+    return {"type": "http.response.start", "status": 200,
+            "headers": [(b"content-type", content_type), (b"etag", b'"abc"')]}
+
+
+def test_pathsend_gets_the_held_start():
+    async def app(scope, receive, send):
+        await send(start_message())
+        await send({"type": "http.response.pathsend", "path": "/tmp/file.svg"})
+
+    sent = run_middleware(app)
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.pathsend"]
+    assert dict(sent[0]["headers"])[b"etag"] == b'"abc"'
+
+
+def test_compressed_body_gets_a_coded_etag():
+    async def app(scope, receive, send):
+        await send(start_message(b"application/json"))
+        await send({"type": "http.response.body", "body": b'{"items": []}' * 20})
+
+    sent = run_middleware(app, "gzip")
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"etag"] == b'"abc-gz"'
@@ -0,0 +1,38 @@
+import asyncio
+
+
+def test_ping_marks_a_late_database_ready(db, monkeypatch):
+    # As after a start-up wait that ran out
+    monkeypatch.setattr(db, "ready", False)
+    assert asyncio.run(db.ping(timeout=1.0)) is True
+    assert db.ready is True
+
+
+def test_ensure_indexes_drops_the_analytics_ttl_index(db):
+    from database import IndexManager
+
+    async def scenario():
+        analytics = db.get_collections()['analytics']
+        await analytics.create_index("timestamp", name="timestamp_ttl", expireAfterSeconds=86400)
+        await IndexManager.ensure_indexes()
+        return await analytics.index_information()
+
+    indexes = asyncio.run(scenario())
+    assert "timestamp_ttl" not in indexes
+    assert "event_timestamp" in indexes
+
+
+def test_ensure_indexes_goes_on_past_an_index_that_cannot_be_built(db):
+    from database import IndexManager
+
+    async def scenario():
+        products = db.get_collections()['products']
+        await products.insert_many([{"id": 1, "name": "a"}, {"id": 1, "name": "b"}])
+        result = await IndexManager.ensure_indexes()
+        return result, await products.index_information()
+
+    result, indexes = asyncio.run(scenario())
+    assert result["failed"] == {"products": ["id_unique"]}
+    assert "id_unique" not in indexes
+    # Declared after id_unique, and still built
+    assert "featured_category_id" in indexes
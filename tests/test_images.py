@@ -0,0 +1,60 @@
+import pytest
+
+from images import IMAGE_WIDTHS, ImageStore, variant_widths
+
+
+@pytest.mark.parametrize("width, expected", [
+    (200, [200]),
+    (320, [320]),
+    (700, [320, 640, 700]),
+    (1280, [320, 640, 960, 1280]),
+    (1284, [320, 640, 960, 1280]),
+    (2000, [320, 640, 960, 1280]),
+])
+def test_variant_widths(width, expected):
+    assert variant_widths(width) == expected
+
+
+def test_variant_widths_never_upscale():
+    for width in range(1, 3000, 37):
+        widths = variant_widths(width)
+        assert len(widths) == len(set(widths))
+        assert max(widths) == min(width, IMAGE_WIDTHS[-1])
+
+
+@pytest.fixture
+def roots(tmp_path, monkeypatch):
+    source, media = tmp_path / "public", tmp_path / "media"
+    (source / "images").mkdir(parents=True)
+    (source / "images" / "rolex1.jpg").write_bytes(b"jpeg")
+    (tmp_path / "secret.txt").write_text("secret")
+    monkeypatch.setenv("IMAGE_SOURCE_DIR", str(source))
+    monkeypatch.setenv("IMAGE_STORE_DIR", str(media))
+    media.mkdir()
+    (media / "abc.webp").write_bytes(b"webp")
+    return source, media
+
+
+def test_resolve_inside_roots(roots):
+    source, media = roots
+    assert ImageStore.resolve("/images/rolex1.jpg") == (source / "images" / "rolex1.jpg").resolve()
+    assert ImageStore.resolve("/api/media/abc.webp") == (media / "abc.webp").resolve()
+
+
+@pytest.mark.parametrize("url", [
+    None,
+    "",
+    "https://example.com/a.jpg",
+    "/images/missing.jpg",
+    "/../secret.txt",
+    "/images/../../secret.txt",
+    "/api/media/../secret.txt",
+])
+def test_resolve_rejects(roots, url):
+    assert ImageStore.resolve(url) is None
+
+
+def test_resolve_rejects_symlink_out_of_root(roots, tmp_path):
+    source, _ = roots
+    (source / "images" / "link.txt").symlink_to(tmp_path / "secret.txt")
+    assert ImageStore.resolve("/images/link.txt") is None
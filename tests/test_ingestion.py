@@ -0,0 +1,97 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from ingestion import ClickIngestor
+from models import TelegramClick
+
+BROWSER = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) Mobile/15E148 Safari/604.1"
+
+
+@pytest.fixture
+def ingestor(db, monkeypatch):
+    """ClickIngestor with fresh counters; limits come from CLICK_* variables set per test"""
+    for name, value in {"_queue": None, "_task": None, "_closed": False, "_dedup": None,
+                        "_accepted": 0, "_dropped": 0, "_written": 0, "_failed": 0, "_batches": 0,
+                        "_filtered": Counter(), "_filtered_total": Counter()}.items():
+        monkeypatch.setattr(ClickIngestor, name, value)
+    return ClickIngestor
+
+
+def limits(monkeypatch, queue=100, batch=100, interval=60.0):
+    monkeypatch.setenv("CLICK_QUEUE_MAX", str(queue))
+    monkeypatch.setenv("CLICK_BATCH_SIZE", str(batch))
+    monkeypatch.setenv("CLICK_FLUSH_INTERVAL", str(interval))
+
+
+async def stored(db) -> int:
+    return await db.get_collections()['analytics'].count_documents({})
+
+
+def test_full_queue_drops_instead_of_waiting(ingestor, db, monkeypatch):
+    limits(monkeypatch, queue=3)
+
+    async def scenario():
+        ingestor.start()
+        # No await in between, so the flusher has not taken anything yet
+        accepted = [ingestor.submit(TelegramClick(user_agent=BROWSER)) for _ in range(5)]
+        await ingestor.stop()
+        return accepted, await stored(db)
+
+    accepted, written = asyncio.run(scenario())
+    assert accepted == [True, True, True, False, False]
+    assert written == 3
+    stats = ingestor.stats()
+    assert (stats["accepted"], stats["dropped"], stats["written"]) == (3, 2, 3)
+
+
+def test_flushes_a_full_batch_without_waiting_for_the_interval(ingestor, db, monkeypatch):
+    limits(monkeypatch, batch=2, interval=60.0)
+
+    async def scenario():
+        ingestor.start()
+        for _ in range(4):
+            ingestor.submit(TelegramClick(user_agent=BROWSER))
+        await asyncio.sleep(0.1)
+        written = await stored(db)
+        await ingestor.stop()
+        return written
+
+    assert asyncio.run(scenario()) == 4
+    assert ingestor.stats()["batches"] == 2
+
+
+def test_flushes_a_partial_batch_after_the_interval(ingestor, db, monkeypatch):
+    limits(monkeypatch, batch=100, interval=0.05)
+
+    async def scenario():
+        ingestor.start()
+        ingestor.submit(TelegramClick(user_agent=BROWSER))
+        await asyncio.sleep(0.01)
+        early = await stored(db)
+        await asyncio.sleep(0.2)
+        late = await stored(db)
+        await ingestor.stop()
+        return early, late
+
+    assert asyncio.run(scenario()) == (0, 1)
+
+
+def test_stop_drains_the_queue_and_refuses_new_events(ingestor, db, monkeypatch):
+    limits(monkeypatch, batch=100, interval=60.0)
+
+    async def scenario():
+        ingestor.start()
+        for _ in range(3):
+            ingestor.submit(TelegramClick(user_agent=BROWSER))
+        await asyncio.sleep(0.01)
+        before = await stored(db)
+        await ingestor.stop()
+        after = await stored(db)
+        return before, after, ingestor.submit(TelegramClick(user_agent=BROWSER))
+
+    before, after, late = asyncio.run(scenario())
+    assert (before, after, late) == (0, 3, False)
+    assert not ingestor.running()
+    assert ingestor.stats()["dropped"] == 1
@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+from pydantic import ValidationError
+
+import models
+from landing import CATALOG_ELEMENT_ID, FALLBACK_TEMPLATE, load_template, render_landing, template_stamp
+
+PRODUCTS = [{"id": 1, "name": "Reloj <b>", "category": "relojes", "image": None}]
+TESTIMONIALS = [{"id": 1, "name": "Ana", "rating": 5, "review": "</script><script>x()</script>", "review_image": None}]
+
+
+def catalog_json():
+    return json.dumps({"products": PRODUCTS, "testimonials": TESTIMONIALS}).encode("utf-8")
+
+
+def test_inline_catalog_cannot_close_the_script(monkeypatch, tmp_path):
+    monkeypatch.setenv("LANDING_TEMPLATE", str(tmp_path / "missing.html"))
+    page = render_landing(PRODUCTS, TESTIMONIALS, catalog_json()).decode("utf-8")
+    start = page.index(f'<script id="{CATALOG_ELEMENT_ID}" type="application/json">')
+    inline = page[start:].split(">", 1)[1].split("</script>", 1)[0]
+    assert json.loads(inline) == {"products": PRODUCTS, "testimonials": TESTIMONIALS}
+    assert "Reloj &lt;b&gt;" in page
+
+
+def test_template_stamp_follows_the_file(monkeypatch, tmp_path):
+    template = tmp_path / "index.html"
+    monkeypatch.setenv("LANDING_TEMPLATE", str(template))
+    assert template_stamp() is None
+    assert load_template() == FALLBACK_TEMPLATE
+
+    template.write_text('<body><div id="root"></div><script src="%PUBLIC_URL%/main.a.js"></script></body>')
+    first = template_stamp()
+    assert first is not None
+    assert load_template().endswith('<script src="/main.a.js"></script></body>')
+
+    template.write_text('<body><div id="root"></div><script src="/main.bb.js"></script></body>')
+    stat = template.stat()
+    os.utime(template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert template_stamp() != first
+
+
+@pytest.mark.parametrize("rating, stars", [(5, 5), (3, 3), (10 ** 9, 5), (-4, 0)])
+def test_stars_are_bounded(monkeypatch, tmp_path, rating, stars):
+    monkeypatch.setenv("LANDING_TEMPLATE", str(tmp_path / "missing.html"))
+    testimonial = {**TESTIMONIALS[0], "rating": rating}
+    page = render_landing([], [testimonial], b"{}").decode("utf-8")
+    assert page.count("★") == stars
+    assert f'aria-label="{stars} de 5"' in page
+
+
+@pytest.mark.parametrize("rating", [0, 6, 3_000_000])
+def test_testimonial_rating_is_validated(rating):
+    with pytest.raises(ValidationError):
+        models.TestimonialCreate(name="Ana", rating=rating)
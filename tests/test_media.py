@@ -0,0 +1,33 @@
+import pytest
+
+from media import parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=999-999", (999, 999)),
+])
+def test_satisfiable(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=-0", "bytes=1000-", "bytes=5-4", "bytes=2000-3000"])
+def test_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_suffix_of_empty_file_is_unsatisfiable():
+    with pytest.raises(ValueError):
+        parse_range("bytes=-10", 0)
+
+
+@pytest.mark.parametrize("header", [
+    "items=0-10", "bytes=0-10,20-30", "bytes=-", "bytes=a-b", "bytes=--5", "bytes=0-+5", "",
+])
+def test_ignored(header):
+    assert parse_range(header, 1000) is None
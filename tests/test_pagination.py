@@ -0,0 +1,45 @@
+import base64
+import json
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor
+
+TYPES = (bool, str, int)
+KEYS = ["featured", "category", "id"]
+
+
+def token(values):
+    raw = json.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def test_round_trip():
+    doc = {"featured": True, "category": "relojes", "id": 4, "name": "Reloj"}
+    assert decode_cursor(encode_cursor(doc, KEYS), TYPES) == [True, "relojes", 4]
+
+
+def test_round_trip_non_ascii():
+    doc = {"featured": False, "category": "camisetas ñ", "id": 12}
+    assert decode_cursor(encode_cursor(doc, KEYS), TYPES) == [False, "camisetas ñ", 12]
+
+
+@pytest.mark.parametrize("values", [
+    [True, {"$ne": None}, {"$gt": -1}],
+    [True, "relojes", True],
+    [1, "relojes", 4],
+    [True, "relojes", 4.5],
+    [True, None, 4],
+    [True, "relojes"],
+    [True, "relojes", 4, 5],
+    {"featured": True},
+])
+def test_rejects_wrong_shape(values):
+    with pytest.raises(ValueError):
+        decode_cursor(token(values), TYPES)
+
+
+@pytest.mark.parametrize("raw", ["", "not-base64!", "bm90IGpzb24", "ñ"])
+def test_rejects_garbage(raw):
+    with pytest.raises(ValueError):
+        decode_cursor(raw, TYPES)
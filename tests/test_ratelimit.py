@@ -0,0 +1,121 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from ratelimit import MemoryBucketStore, RateLimitMiddleware, RateRule, SQLiteBucketStore
+from visitors import client_ip
+
+KEY = ("/api/telegram-click", "203.0.113.7")
+
+
+def takes(store, times, rate=1.0, burst=3, key=KEY):
+    async def run():
+        return [await store.take(key, rate, burst, now) for now in times]
+    return asyncio.run(run())
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBucketStore()
+    return SQLiteBucketStore(str(tmp_path / "buckets.db"))
+
+
+def test_burst_then_wait(store):
+    waits = takes(store, [100.0] * 5)
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(1.0)
+    assert waits[4] == pytest.approx(1.0)
+
+
+def test_refills_at_rate(store):
+    waits = takes(store, [100.0, 100.0, 100.0, 100.5, 101.0, 101.0])
+    assert waits[3] == pytest.approx(0.5)
+    assert waits[4] == 0.0
+    assert waits[5] == pytest.approx(1.0)
+
+
+def test_refill_is_capped_at_burst(store):
+    waits = takes(store, [100.0, 100.0, 100.0, 1000.0, 1000.0, 1000.0, 1000.0])
+    assert waits[3:6] == [0.0, 0.0, 0.0]
+    assert waits[6] == pytest.approx(1.0)
+
+
+def test_buckets_are_per_key(store):
+    takes(store, [100.0] * 3)
+    assert takes(store, [100.0], key=("/api/telegram-click", "203.0.113.8")) == [0.0]
+
+
+def test_memory_store_sweeps_refilled_and_excess_buckets():
+    store = MemoryBucketStore(max_keys=2)
+    for n in range(3):
+        takes(store, [100.0], key=("/x", str(n)))
+    assert len(store) == 2
+    # Every bucket has refilled by now, so only the one just used is left
+    takes(store, [200.0], key=("/x", "new"))
+    assert len(store) == 1
+
+
+def scope(peer, forwarded=()):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/telegram-click",
+        "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded],
+        "client": (peer, 50000) if peer else None,
+    }
+
+
+@pytest.mark.parametrize("peer, forwarded, expected", [
+    # Direct clients: forwarded headers are ignored
+    ("198.51.100.4", ["1.2.3.4"], "198.51.100.4"),
+    ("198.51.100.4", [], "198.51.100.4"),
+    # Behind the ingress: the hop it appended, not what the client sent
+    ("10.0.0.2", ["198.51.100.4"], "198.51.100.4"),
+    ("10.0.0.2", ["1.2.3.4, 198.51.100.4"], "198.51.100.4"),
+    ("10.0.0.2", ["1.2.3.4", "198.51.100.4"], "198.51.100.4"),
+    # Several proxy layers
+    ("127.0.0.1", ["1.2.3.4, 198.51.100.4, 10.0.0.9"], "198.51.100.4"),
+    ("10.0.0.2", ["not-an-ip, 198.51.100.4"], "198.51.100.4"),
+    ("10.0.0.2", [], "10.0.0.2"),
+    (None, [], ""),
+])
+def test_client_ip(monkeypatch, peer, forwarded, expected):
+    monkeypatch.delenv("TRUSTED_PROXIES", raising=False)
+    assert client_ip(Request(scope(peer, forwarded))) == expected
+
+
+def test_client_ip_with_configured_proxies(monkeypatch):
+    monkeypatch.setenv("TRUSTED_PROXIES", "192.0.2.10")
+    assert client_ip(Request(scope("192.0.2.10", ["198.51.100.4"]))) == "198.51.100.4"
+    assert client_ip(Request(scope("10.0.0.2", ["198.51.100.4"]))) == "10.0.0.2"
+
+
+async def ok(scope, receive, send):
+    await PlainTextResponse("ok")(scope, receive, send)
+
+
+def post_statuses(peer, forwarded_values):
+    app = RateLimitMiddleware(
+        ok, rules=(RateRule("POST", "/api/telegram-click", rate=0.001, burst=2),),
+        store=MemoryBucketStore(), enabled=True
+    )
+
+    async def run():
+        transport = httpx.ASGITransport(app=app, client=(peer, 50000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                (await client.post("/api/telegram-click", headers={"x-forwarded-for": value})).status_code
+                for value in forwarded_values
+            ]
+    return asyncio.run(run())
+
+
+def test_spoofed_forwarded_for_does_not_reset_the_bucket(monkeypatch):
+    monkeypatch.delenv("TRUSTED_PROXIES", raising=False)
+    # Straight from the internet, and behind the ingress with client-chosen left hops
+    assert post_statuses("198.51.100.4", ["1.1.1.1", "2.2.2.2", "3.3.3.3"]) == [200, 200, 429]
+    assert post_statuses("10.0.0.2", [f"{n}.{n}.{n}.{n}, 198.51.100.4" for n in (1, 2, 3)]) == [200, 200, 429]
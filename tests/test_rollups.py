@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from rollups import AnalyticsRollup, floor_hour
+
+
+def click(ts, device_class="mobile", os_family="android", source="direct"):
+    return {
+        "event": "telegram_click", "timestamp": ts,
+        "device_class": device_class, "os_family": os_family, "source": source,
+    }
+
+
+def test_rerunning_a_window_gives_the_same_buckets(db):
+    hour = floor_hour(datetime.utcnow()) - timedelta(hours=5)
+
+    async def scenario():
+        collections = db.get_collections()
+        await collections['analytics'].insert_many([
+            click(hour + timedelta(minutes=5)),
+            click(hour + timedelta(minutes=30)),
+            click(hour + timedelta(hours=1, minutes=10), device_class="desktop", os_family="windows"),
+        ])
+        first = await AnalyticsRollup.run_once()
+        buckets = await collections['analytics_rollups'].find({}, sort=[("_id", 1)]).to_list(None)
+        # A crash before the watermark moves repeats the window
+        await collections['analytics_rollups'].delete_one({"_id": "_watermark"})
+        second = await AnalyticsRollup.run_once()
+        again = await collections['analytics_rollups'].find({}, sort=[("_id", 1)]).to_list(None)
+        return first, second, buckets, again
+
+    first, second, buckets, again = asyncio.run(scenario())
+    assert first["buckets"] == second["buckets"] == 2
+    assert again == buckets
+    hourly = {b["bucket"]: b["count"] for b in buckets if b.get("granularity") == "hour"}
+    assert hourly == {hour: 2, hour + timedelta(hours=1): 1}
+    daily = [b for b in buckets if b.get("granularity") == "day"]
+    assert sum(b["count"] for b in daily) == 3
+
+
+def test_expire_keeps_clicks_not_yet_rolled_up(db, monkeypatch):
+    monkeypatch.setenv("ANALYTICS_TTL_DAYS", "30")
+    # Whole seconds, as Mongo keeps only milliseconds
+    now = datetime.utcnow().replace(microsecond=0)
+    old = now - timedelta(days=40)
+
+    async def scenario():
+        collections = db.get_collections()
+        await collections['analytics'].insert_many([
+            click(old),
+            click(old + timedelta(days=2)),
+            {"event": "page_view", "timestamp": old},
+            {"event": "page_view", "timestamp": now},
+        ])
+        # No watermark yet: old clicks stay, old page views go
+        before_rollup = await AnalyticsRollup.expire()
+        await collections['analytics_rollups'].insert_one(
+            {"_id": "_watermark", "granularity": "state", "at": floor_hour(old) + timedelta(days=1)}
+        )
+        after_rollup = await AnalyticsRollup.expire()
+        left = await collections['analytics'].find({}, {"_id": 0}).to_list(None)
+        return before_rollup, after_rollup, left
+
+    before_rollup, after_rollup, left = asyncio.run(scenario())
+    assert before_rollup == 1
+    # Only the click behind the watermark is deleted
+    assert after_rollup == 1
+    assert sorted((e["event"], e["timestamp"]) for e in left) == [
+        ("page_view", now), ("telegram_click", old + timedelta(days=2)),
+    ]
+
+
+def test_expire_is_off_without_a_ttl(db, monkeypatch):
+    monkeypatch.delenv("ANALYTICS_TTL_DAYS", raising=False)
+
+    async def scenario():
+        collections = db.get_collections()
+        await collections['analytics'].insert_one({"event": "page_view", "timestamp": datetime(2000, 1, 1)})
+        return await AnalyticsRollup.expire(), await collections['analytics'].count_documents({})
+
+    assert asyncio.run(scenario()) == (0, 1)
@@ -0,0 +1,52 @@
+import pytest
+
+from visitors import HLL_REGISTERS, HyperLogLog, visitor_id
+
+
+def sketch(values):
+    hll = HyperLogLog()
+    for value in values:
+        hll.add(value)
+    return hll
+
+
+def test_empty_sketch():
+    assert HyperLogLog().estimate() == 0
+
+
+@pytest.mark.parametrize("n", [1, 10, 100, 1000, 20000])
+def test_estimate_within_error(n):
+    estimate = sketch(f"visitor-{i}" for i in range(n)).estimate()
+    # ~1.6% standard error; 5% is over three sigma
+    assert abs(estimate - n) <= max(1, 0.05 * n)
+
+
+def test_duplicates_do_not_count():
+    assert sketch(["a", "b", "a", "b", "a"]).estimate() == 2
+
+
+def test_merge_is_the_union():
+    left = sketch(f"v{i}" for i in range(0, 6000))
+    right = sketch(f"v{i}" for i in range(4000, 10000))
+    union = sketch(f"v{i}" for i in range(10000))
+    assert left.merge(right).registers == union.registers
+
+
+def test_binary_round_trip():
+    hll = sketch(f"v{i}" for i in range(500))
+    data = hll.to_binary()
+    assert len(data) < HLL_REGISTERS
+    assert HyperLogLog.from_binary(bytes(data)).registers == hll.registers
+
+
+def test_visitor_id_is_keyed_and_stable(monkeypatch):
+    import visitors
+
+    monkeypatch.setenv("VISITOR_HASH_SECRET", "one")
+    monkeypatch.setattr(visitors, "_secret", None)
+    first = visitor_id("198.51.100.4", "UA")
+    assert first == visitor_id("198.51.100.4", "UA")
+    assert first != visitor_id("198.51.100.5", "UA")
+    monkeypatch.setenv("VISITOR_HASH_SECRET", "two")
+    monkeypatch.setattr(visitors, "_secret", None)
+    assert visitor_id("198.51.100.4", "UA") != first